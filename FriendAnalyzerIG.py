@@ -1,12 +1,16 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import os
+import hashlib
 import re
 import zipfile as zp
-import json
 import altair as alt
 import logging
 
+import ig_ingest
+import ig_metrics
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,12 +30,15 @@ This tool analyzes your friendships using **messages, story interactions, close
 2. **Download the ZIP** that Instagram emails you.
 3. **Upload the ZIP here**.
 4. The analyzer will **automatically process** your data and show results.  
-   ✅ Includes **search & filter options** for exploring friends.
+   ✅ Includes **search & filter options** for exploring friends.  
+   📅 Optionally pick a **date range** to analyze — messages outside it are skipped while reading, so shorter ranges load faster.
 
 ### Privacy
-- Analysis runs **locally** in this app session.
+- Analysis runs on the machine hosting this app; nothing is sent to third parties.
 - Only reads relevant metadata (timestamps, participants, interactions, counts).
 - Media files and ad/monetization data are ignored.
+- Your ZIP is kept in a temporary file on the app host and deleted after a day without use (`IG_SPOOL_MAX_AGE`).
+- Parsed metadata (who sent each message and when) is cached on the app host, per export and per Instagram account, so re-uploads open instantly; the least recently used entries are deleted past `IG_CACHE_MAX_BYTES`. Set `IG_CACHE_MAX_BYTES=0` to turn caching off.
 """)
 
 with st.expander("📥 How to Request & Download Your Instagram Data"):
@@ -41,7 +48,7 @@ with st.expander("📥 How to Request & Download Your Instagram Data"):
     2. Go to **Settings and privacy** → **Your information and permissions**.
     3. Tap **Download your information** → **All of your information**.
     4. Select **JSON** format.
-    5. (Optional) Pick a smaller **date range** if you want faster analysis.
+    5. (Optional) Pick a smaller **date range** for a smaller download. You can also narrow the analysis to any dates in this app after uploading.
     6. Submit the request, then download the ZIP from the email.
     7. ⚠️ You may skip **Ads/Monetization** files when requesting.
 
@@ -62,73 +69,39 @@ with st.expander("📥 How to Request & Download Your Instagram Data"):
     **Important:** Upload the ZIP without unzipping it.
     """, unsafe_allow_html=True)
 
-uploaded_zip = st.file_uploader("📂 Upload your Instagram messages ZIP", type=["zip"])
+# Large exports arrive as several ZIPs; all parts are analyzed as one export
+uploaded_zip = st.file_uploader("📂 Upload your Instagram messages ZIP (all parts, if it was split)",
+                                type=["zip"], accept_multiple_files=True) or None
+# Optional date window; messages outside it are dropped while the export is parsed
+date_window = st.date_input("📅 Only analyze messages between (optional)", value=[], format="YYYY-MM-DD")
+date_range = ig_ingest.date_range_ms(*date_window) if date_window else None
 st.sidebar.title('🎯 Search & Filter Friends')
 
-def safe_encode_decode(text):
-    """Safely encode and decode text to handle special characters."""
-    try:
-        return text.encode('latin1').decode('utf-8')
-    except (UnicodeEncodeError, UnicodeDecodeError):
-        try:
-            return text.encode('utf-8').decode('utf-8')
-        except (UnicodeEncodeError, UnicodeDecodeError):
-            logger.warning(f"Could not properly decode text: {text}")
-            return str(text)  # Fallback to string conversion
-
-def calculate_reply_times(messages):
+def spool_upload_once(uploaded_zips):
     """
-    Calculate reply times between messages from different participants.
-    Returns: (avg_reply_time, fastest_reply_time, longest_reply_time) in seconds.
+    Spool each uploaded file to disk once; reruns reuse its (hash, path) pair.
+    Returns one hash for the whole set of parts and their paths in hash order.
     """
-    try:
-        if not messages or len(messages) < 2:
-            return 0, 0, 0
-        
-        reply_times = []
+    spooled = st.session_state.setdefault('spooled_uploads', {})
+    for uploaded in uploaded_zips:
+        if uploaded.file_id not in spooled or not os.path.exists(spooled[uploaded.file_id][1]):
+            spooled[uploaded.file_id] = ig_ingest.spool_upload(uploaded)
+    parts = sorted(spooled[uploaded.file_id] for uploaded in uploaded_zips)
+    upload_hash = hashlib.sha256(''.join(part_hash for part_hash, _ in parts).encode()).hexdigest()
+    return upload_hash, [path for _, path in parts]
+
+@st.cache_resource(show_spinner=False, max_entries=3)
+def load_export_cached(upload_hash, _zip_paths, _username=None, date_range=None):
+    """
+    Parse the export once per set of uploads and date range; reruns share the same
+    tables instead of unpickling a copy of the message table, so treat them as read-only.
+    """
+    return ig_ingest.load_export(_zip_paths, username=_username, date_range=date_range)
 
-        # Sort messages by timestamp (oldest first)
-        try:
-            sorted_messages = sorted(messages, key=lambda x: x.get('timestamp_ms', 0))
-        except (KeyError, TypeError) as e:
-            logger.warning(f"Error sorting messages by timestamp: {e}")
-            return 0, 0, 0
-
-        for i in range(1, len(sorted_messages)):
-            try:
-                prev_msg = sorted_messages[i - 1]
-                curr_msg = sorted_messages[i]
-
-                # Check if required fields exist
-                if not all(key in prev_msg for key in ['sender_name', 'timestamp_ms']) or \
-                   not all(key in curr_msg for key in ['sender_name', 'timestamp_ms']):
-                    continue
-
-                # Only calculate reply time if it's a different sender replying
-                if prev_msg['sender_name'] != curr_msg['sender_name']:
-                    time_diff_ms = curr_msg['timestamp_ms'] - prev_msg['timestamp_ms']
-                    if time_diff_ms > 0:  # Ensure positive time difference
-                        time_diff_seconds = time_diff_ms / 1000
-                        reply_times.append(time_diff_seconds)
-            except (KeyError, TypeError, ValueError) as e:
-                logger.warning(f"Error processing message pair at index {i}: {e}")
-                continue
-
-        # Calculate statistics
-        if reply_times:
-            try:
-                avg_reply_time = sum(reply_times) / len(reply_times)
-                fastest_reply_time = min(reply_times)
-                longest_reply_time = max(reply_times)
-                return avg_reply_time, fastest_reply_time, longest_reply_time
-            except (ValueError, ZeroDivisionError) as e:
-                logger.warning(f"Error calculating reply time statistics: {e}")
-                return 0, 0, 0
-        else:
-            return 0, 0, 0
-    except Exception as e:
-        logger.error(f"Unexpected error in calculate_reply_times: {e}")
-        return 0, 0, 0
+@st.cache_data(show_spinner=False, max_entries=6)
+def load_section_cached(upload_hash, section, _zip_paths, date_range=None):
+    """Decode a non-inbox section ('story' or 'connections') the first time a view needs it."""
+    return ig_ingest.load_section(_zip_paths, section, date_range=date_range)
 
 def format_time(seconds):
     """Format seconds into human-readable time format."""
@@ -153,234 +126,80 @@ def format_time(seconds):
     except (ValueError, TypeError):
         return "N/A"
 
-if uploaded_zip is not None:
-    try:
-        with zp.ZipFile(uploaded_zip) as z:
-            try:
-                # Get top folder name from the ZIP
-                file_list = z.namelist()
-                if not file_list:
-                    st.error("❌ The uploaded ZIP file appears to be empty.")
-                    st.stop()
-                
-                top_folder = str(uploaded_zip)
-
-                # Extract username between "instagram-" and "-YYYY-MM-DD"
-                match = re.search(r"instagram-(.+?)-\d{4}-\d{2}-\d{2}", top_folder)
-                if match:
-                    raw_username = match.group(1)
-
-                    # Simple encoding: UTF-8 → hex
-                    try:
-                        encoded_username = raw_username.encode("utf-8").hex()
-                        st.info(f"📌 Detected username: **{raw_username}**")
-                    except UnicodeEncodeError as e:
-                        logger.warning(f"Error encoding username: {e}")
-                        st.warning("⚠️ Username detected but contains special characters.")
-                else:
-                    st.warning("❌ Could not detect username from folder name.")
-                    st.stop()
-            except Exception as e:
-                st.error(f"❌ Error reading ZIP file structure: {e}")
-                st.stop()
-
-            # Target inbox path
-            inbox_path_prefix = "your_instagram_activity/messages/inbox/"
-
-            # Collect all `message_1.json` files in subfolders
-            message_jsons = []
-            deactivated_accounts = set()
-            
-            try:
-                for file_name in z.namelist():
-                    try:
-                        parts = file_name[len(inbox_path_prefix):].split('/')
-
-                        if len(parts) > 1:
-                            folder_name = parts[0]
-                            if folder_name.startswith('instagramuser_'):
-                                deactivated_accounts.add(folder_name)
 
-                        if file_name.startswith(inbox_path_prefix) and file_name.endswith("message_1.json"):
-                            try:
-                                with z.open(file_name) as f:
-                                    data = json.load(f)
-                                    if isinstance(data, dict) and 'messages' in data:
-                                        message_jsons.append(data)
-                                    else:
-                                        logger.warning(f"Invalid JSON structure in {file_name}")
-                            except json.JSONDecodeError as e:
-                                st.warning(f"Invalid JSON in {file_name}: {e}")
-                            except Exception as e:
-                                st.warning(f"Error reading {file_name}: {e}")
-                    except Exception as e:
-                        logger.warning(f"Error processing file {file_name}: {e}")
-                        continue
-            except Exception as e:
-                st.error(f"❌ Error scanning ZIP contents: {e}")
-                st.stop()
-
-            # Initialize data structures
-            Users = {
-                'names': [],
-                'msgs_count': [],
-                'avg_reply_time': [],
-                'longest_reply_time': [],
-                'fastest_reply_time': []
-            }
-            
-            groups = 0
+def activity_heatmap(counts, title):
+    """Day x hour heatmap chart of one row of hour-of-week message counts."""
+    return (
+        alt.Chart(ig_metrics.heatmap_cells(counts))
+        .mark_rect()
+        .encode(
+            x=alt.X("hour:O", title=f"Hour ({ig_ingest.TIMEZONE})"),
+            y=alt.Y("day:O", sort=list(ig_metrics.WEEKDAYS), title=""),
+            color=alt.Color("messages:Q", scale=alt.Scale(scheme="blues"), title="Messages"),
+            tooltip=["day", "hour", "messages"]
+        )
+        .properties(height=220, title=title)
+    )
 
-            # Process message data
-            try:
-                if len(message_jsons) > 0:
-                    for msg in message_jsons:
-                        try:
-                            # Check if required fields exist
-                            if 'participants' not in msg or 'messages' not in msg:
-                                logger.warning("Missing required fields in message JSON")
-                                continue
-                                
-                            # Skip group chats
-                            if len(msg['participants']) > 2:
-                                groups += 1
-                                continue
-                                
-                            # Skip Instagram User or empty participants
-                            if (not msg['participants'] or 
-                                len(msg['participants']) == 0 or 
-                                msg['participants'][0].get('name') == 'Instagram User'):
-                                continue
-                                
-                            participant_name = msg['participants'][0].get('name', 'Unknown')
-                            if participant_name in Users['names'] or participant_name == 'Unknown':
-                                continue
-                            
-                            # Calculate reply times for this conversation
-                            try:
-                                avg_reply, fastest_reply, longest_reply = calculate_reply_times(msg['messages'])
-                            except Exception as e:
-                                logger.warning(f"Error calculating reply times for {participant_name}: {e}")
-                                avg_reply, fastest_reply, longest_reply = 0, 0, 0
-                            
-                            # Safely decode the name
-                            safe_name = safe_encode_decode(participant_name)
-                            
-                            Users['names'].append(safe_name)
-                            Users['msgs_count'].append(len(msg['messages']))
-                            Users['avg_reply_time'].append(avg_reply)
-                            Users['fastest_reply_time'].append(fastest_reply)
-                            Users['longest_reply_time'].append(longest_reply)
-                            
-                        except Exception as e:
-                            logger.warning(f"Error processing message conversation: {e}")
-                            continue
-                else:
-                    st.warning("⚠️ No message files found in the expected location.")
-            except Exception as e:
-                st.error(f"❌ Error processing message data: {e}")
-
-            st.info(f"📭 {len(deactivated_accounts)} deactivated accounts & {groups} group chats found! Skipping analysis for these.")
-            st.success(f"✅ Found {len(message_jsons)} message files in inbox.")
-            
-            # Create DataFrame with error handling
-            try:
-                inbox_df = pd.DataFrame(Users)
-                if not inbox_df.empty:
-                    inbox_df = inbox_df[inbox_df['avg_reply_time'] != 0]
-                    inbox_df = inbox_df.sort_values(by='msgs_count', ascending=False).reset_index(drop=True)
-                else:
-                    st.warning("⚠️ No valid conversation data found.")
-            except Exception as e:
-                st.error(f"❌ Error creating inbox DataFrame: {e}")
-                inbox_df = pd.DataFrame()
+if uploaded_zip is not None:
+    encoded_username = None
+    try:
+        top_folder = ' '.join(uploaded.name for uploaded in uploaded_zip)
 
-            # Process story interactions
-            story_likes = None
-            story_path = "your_instagram_activity/story_interactions/"
-            
-            try:
-                for file_name in z.namelist():
-                    if file_name.startswith(story_path) and file_name.endswith("story_likes.json"):
-                        try:
-                            with z.open(file_name) as f:
-                                data = json.load(f)
-                                story_likes = data
-                                break
-                        except json.JSONDecodeError as e:
-                            st.warning(f"Invalid JSON in story likes file: {e}")
-                        except Exception as e:
-                            logger.warning(f"Error reading story likes file: {e}")
-            except Exception as e:
-                logger.warning(f"Error processing story interactions: {e}")
-            
-            user_by_story = {}
-            story_df = pd.DataFrame()
-            
-            try:
-                if story_likes and 'story_activities_story_likes' in story_likes:
-                    for user in story_likes['story_activities_story_likes']:
-                        try:
-                            title = user.get('title', 'Unknown')
-                            if title != 'Unknown':
-                                user_by_story[title] = user_by_story.get(title, 0) + 1
-                        except Exception as e:
-                            logger.warning(f"Error processing story like entry: {e}")
-                            continue
-                    
-                    if user_by_story:
-                        story_df = pd.Series(user_by_story).reset_index().rename(columns={'index': 'User_Name', 0: 'Story_Likes'})
-                        story_df.sort_values(by='Story_Likes', ascending=False, inplace=True)
-                        story_df.reset_index(inplace=True, drop=True)
-            except Exception as e:
-                logger.warning(f"Error processing story data: {e}")
-                
-            # Process followers and following data
-            new_path = "connections/followers_and_following/"
-            followers = []
-            followings = {"relationships_following": []}
-            close_friends = {"relationships_close_friends": []}
+        # Extract username between "instagram-" and "-YYYY-MM-DD"
+        match = re.search(r"instagram-(.+?)-\d{4}-\d{2}-\d{2}", top_folder)
+        if match:
+            raw_username = match.group(1)
 
+            # Simple encoding: UTF-8 → hex
             try:
-                for file_name in z.namelist():
-                    try:
-                        if file_name.startswith(new_path):
-                            if file_name.endswith("followers_1.json"):
-                                try:
-                                    with z.open(file_name) as f:
-                                        data = json.load(f)
-                                        followers = data if isinstance(data, list) else []
-                                except json.JSONDecodeError as e:
-                                    st.warning(f"Invalid JSON in followers file: {e}")
-                            
-                            elif file_name.endswith("following.json"):
-                                try:
-                                    with z.open(file_name) as f:
-                                        data = json.load(f)
-                                        followings = data if isinstance(data, dict) else {"relationships_following": []}
-                                except json.JSONDecodeError as e:
-                                    st.warning(f"Invalid JSON in following file: {e}")
-                            
-                            elif file_name.endswith("close_friends.json"):
-                                try:
-                                    with z.open(file_name) as f:
-                                        data = json.load(f)
-                                        close_friends = data if isinstance(data, dict) else {"relationships_close_friends": []}
-                                except json.JSONDecodeError as e:
-                                    st.warning(f"Invalid JSON in close friends file: {e}")
-                    except Exception as e:
-                        logger.warning(f"Error processing connection file {file_name}: {e}")
-                        continue
-            except Exception as e:
-                logger.warning(f"Error processing connection data: {e}")
+                encoded_username = raw_username.encode("utf-8").hex()
+                st.info(f"📌 Detected username: **{raw_username}**")
+            except UnicodeEncodeError as e:
+                logger.warning(f"Error encoding username: {e}")
+                st.warning("⚠️ Username detected but contains special characters.")
+        else:
+            st.warning("❌ Could not detect username from folder name.")
+            st.stop()
+    except Exception as e:
+        st.error(f"❌ Error reading ZIP file structure: {e}")
+        st.stop()
 
+    try:
+        upload_hash, zip_paths = spool_upload_once(uploaded_zip)
+        export = load_export_cached(upload_hash, zip_paths, encoded_username, date_range)
     except zp.BadZipFile:
-        st.error("❌ The uploaded file is not a valid ZIP file or is corrupted.")
+        st.error("❌ An uploaded file is not a valid ZIP file or is corrupted.")
+        st.stop()
+    except ig_ingest.ResourceLimitExceeded as e:
+        st.error(f"❌ {e}")
         st.stop()
     except Exception as e:
         st.error(f"❌ An unexpected error occurred while processing the ZIP file: {e}")
         st.stop()
 
+    if not export['file_count']:
+        st.error("❌ The uploaded ZIP file appears to be empty.")
+        st.stop()
+
+    for level, text in export['notices']:
+        getattr(st, level)(text)
+
+    inbox_df = export['inbox_df']
+
+    # Follower counts are on the dashboard; story likes are only decoded when their view is opened
+    try:
+        connections_df, connection_notices = load_section_cached(upload_hash, 'connections', zip_paths, date_range)
+    except ig_ingest.ResourceLimitExceeded as e:
+        connections_df = pd.DataFrame(columns=['relation', 'username', 'href', 'timestamp'])
+        connection_notices = [('warning', f"⚠️ Followers and following were skipped: {e}")]
+    for level, text in connection_notices:
+        getattr(st, level)(text)
+    relation_counts = connections_df['relation'].value_counts()
+
+    st.info(f"📭 {export['deactivated_accounts']} deactivated accounts & {export['groups']} group chats found! These are left out of the friend rankings.")
+    st.success(f"✅ Found {export['message_files']} message files in inbox.")
+
     # Display metrics and interface
     try:
         st.write('\n\n\n\n')
@@ -389,7 +208,7 @@ if uploaded_zip is not None:
         cols = st.columns(3)
         with cols[0]:
             try:
-                follower_count = len(followers) if followers else 0
+                follower_count = int(relation_counts.get('followers', 0))
                 st.metric(label='Followers', value=follower_count, border=True)
             except Exception as e:
                 st.metric(label='Followers', value='N/A', border=True)
@@ -397,7 +216,7 @@ if uploaded_zip is not None:
 
         with cols[1]:
             try:
-                following_count = len(followings.get("relationships_following", [])) if followings else 0
+                following_count = int(relation_counts.get('following', 0))
                 st.metric(label='Following', value=following_count, border=True)
             except Exception as e:
                 st.metric(label='Following', value='N/A', border=True)
@@ -405,7 +224,7 @@ if uploaded_zip is not None:
             
         with cols[2]:
             try:
-                close_friends_count = len(close_friends.get("relationships_close_friends", [])) if close_friends else 0
+                close_friends_count = int(relation_counts.get('close_friends', 0))
                 st.metric(label='Close Friends', value=close_friends_count, border=True)
             except Exception as e:
                 st.metric(label='Close Friends', value='N/A', border=True)
@@ -432,6 +251,9 @@ if uploaded_zip is not None:
             else:
                 with st.expander("👍 Number of Friends' Stories You Liked"):
                     try:
+                        story_df, story_notices = load_section_cached(upload_hash, 'story', zip_paths, date_range)
+                        for level, text in story_notices:
+                            getattr(st, level)(text)
                         if not story_df.empty:
                             st.dataframe(story_df)
                         else:
@@ -445,19 +267,20 @@ if uploaded_zip is not None:
 
         press_1 = False
         press_2 = False
+        top_df = None
 
         with st.sidebar:
             col1, col2 = st.columns([0.4, 0.4])
 
             with col1:
-                if st.button("👥 Top 10 Friends"):
+                if st.button(f"👥 Top {ig_ingest.RANKING_SIZE} Friends"):
                     if uploaded_zip is None:
                         st.warning('Please Upload The Zip File First')
                     else:
                         press_1 = True
 
             with col2:
-                if st.button("🐍 Top 10 Snakes"):
+                if st.button(f"🐍 Top {ig_ingest.RANKING_SIZE} Snakes"):
                     if uploaded_zip is None:
                         st.warning('Please Upload The Zip File First')
                     else:
@@ -465,27 +288,30 @@ if uploaded_zip is not None:
         
         # Display analysis results
         try:
+            if press_1 or press_2:
+                # One indexed Top-K query per rerun, shared with the charts below
+                top_df = ig_metrics.top_k(
+                    inbox_df, export['rank_df'], 'avg_reply_time',
+                    ig_ingest.RANKING_SIZE, ig_ingest.RANKING_THRESHOLD, largest=press_2
+                )
+
             if press_1:
                 try:
-                    new_df = inbox_df[inbox_df['msgs_count'] > 50]
-                    if not new_df.empty:
-                        new_df = new_df.nsmallest(columns='avg_reply_time', n=10)
-                        with st.expander("📊 Preview Or Download Your Friendship Data ➡️ (Top 10 Friends)"):
-                            st.dataframe(new_df)
+                    if not top_df.empty:
+                        with st.expander(f"📊 Preview Or Download Your Friendship Data ➡️ (Top {ig_ingest.RANKING_SIZE} Friends)"):
+                            st.dataframe(top_df)
                     else:
-                        st.warning("No friends with more than 50 messages found.")
+                        st.warning(f"No friends with more than {ig_ingest.RANKING_THRESHOLD} messages found.")
                 except Exception as e:
                     st.error(f"Error generating top friends analysis: {e}")
 
             elif press_2:
                 try:
-                    new_df = inbox_df[inbox_df['msgs_count'] > 50]
-                    if not new_df.empty:
-                        new_df = new_df.nlargest(columns='avg_reply_time', n=10)
-                        with st.expander("📊 Preview Or Download Your Friendship Data ➡️ (Top 10 Snakes)"):
-                            st.dataframe(new_df)
+                    if not top_df.empty:
+                        with st.expander(f"📊 Preview Or Download Your Friendship Data ➡️ (Top {ig_ingest.RANKING_SIZE} Snakes)"):
+                            st.dataframe(top_df)
                     else:
-                        st.warning("No friends with more than 50 messages found.")
+                        st.warning(f"No friends with more than {ig_ingest.RANKING_THRESHOLD} messages found.")
                 except Exception as e:
                     st.error(f"Error generating top snakes analysis: {e}")
             
@@ -505,6 +331,18 @@ if uploaded_zip is not None:
                                 st.info(f"No data found for {selected_friend}.")
                     except Exception as e:
                         st.error(f"Error displaying friendship data: {e}")
+
+                # Group chats: who replies to whom, from the sparse reply matrix
+                if selected_friend == 'ALL FRIENDS' and not export['group_replies_df'].empty:
+                    with st.expander(f"👥 Group Chats ➡️ Who Replies To Whom ({export['groups']} groups)"):
+                        try:
+                            members_df, pairs_df = ig_ingest.group_chat_stats(export['group_replies_df'], export['senders_df'])
+                            st.markdown("**Member Responsiveness**")
+                            st.dataframe(members_df)
+                            st.markdown("**Pairwise Affinity** (share of two members' replies that went to each other)")
+                            st.dataframe(pairs_df)
+                        except Exception as e:
+                            st.error(f"Error displaying group chat data: {e}")
         except Exception as e:
             st.error(f"Error in analysis display: {e}")
 
@@ -521,12 +359,10 @@ try:
 
             try:
                 if press_1:
-                    st.markdown("### 👑 Top 10 Closest Friends")
-                    st.markdown("These are your friends with the **fastest reply times** (and at least 50+ messages).")
-                    new_df = inbox_df[inbox_df['msgs_count'] > 50]
+                    st.markdown(f"### 👑 Top {ig_ingest.RANKING_SIZE} Closest Friends")
+                    st.markdown(f"These are your friends with the **fastest reply times** (and more than {ig_ingest.RANKING_THRESHOLD} messages).")
+                    new_df = top_df
                     if not new_df.empty:
-                        new_df = new_df.nsmallest(columns='avg_reply_time', n=10)
-
                         try:
                             chart = (
                                 alt.Chart(new_df)
@@ -546,13 +382,11 @@ try:
                         st.warning("No friends with sufficient message history for analysis.")
 
                 if press_2:
-                    st.markdown("### 🐍 Top 10 Snakes")
-                    st.markdown("Friends who took the **longest to reply** (50+ messages). 🕐")
+                    st.markdown(f"### 🐍 Top {ig_ingest.RANKING_SIZE} Snakes")
+                    st.markdown(f"Friends who took the **longest to reply** (more than {ig_ingest.RANKING_THRESHOLD} messages). 🕐")
                     st.info("⚠️ Just for fun — they're not real snakes, promise! 🐍😂")
-                    new_df = inbox_df[inbox_df['msgs_count'] > 50]
+                    new_df = top_df
                     if not new_df.empty:
-                        new_df = new_df.nlargest(columns='avg_reply_time', n=10)
-
                         try:
                             chart = (
                                 alt.Chart(new_df)
@@ -633,6 +467,55 @@ try:
                             st.write(f"- Fastest: {format_time(row['fastest_reply_time'])}")
                             st.write(f"- Slowest: {format_time(row['longest_reply_time'])}")
 
+                        # Monthly trends, a slice of the friend x month x direction rollup cube
+                        cube_df = export['cube_df']
+                        trend_df = cube_df[cube_df['friend'] == selected_friend]
+                        if not trend_df.empty:
+                            try:
+                                trend_df = trend_df.assign(
+                                    direction=trend_df['direction'].map({'received': f"From {selected_friend}", 'sent': "From you"}),
+                                    avg_reply_time=trend_df['reply_time_sum'] / trend_df['reply_count'].where(trend_df['reply_count'] > 0),
+                                )
+
+                                messages_chart = (
+                                    alt.Chart(trend_df)
+                                    .mark_bar()
+                                    .encode(
+                                        x=alt.X("yearmonth(month):T", title="Month"),
+                                        y=alt.Y("msgs_count:Q", title="Messages"),
+                                        color=alt.Color("direction:N", title=""),
+                                        tooltip=[alt.Tooltip("yearmonth(month):T", title="Month"), "direction", "msgs_count"]
+                                    )
+                                    .properties(height=250, title="Messages per Month")
+                                )
+                                reply_trend_chart = (
+                                    alt.Chart(trend_df.dropna(subset=['avg_reply_time']))
+                                    .mark_line(point=True)
+                                    .encode(
+                                        x=alt.X("yearmonth(month):T", title="Month"),
+                                        y=alt.Y("avg_reply_time:Q", title="Average Reply Time (seconds)"),
+                                        color=alt.Color("direction:N", title=""),
+                                        tooltip=[alt.Tooltip("yearmonth(month):T", title="Month"), "direction", "avg_reply_time", "p50_reply_time"]
+                                    )
+                                    .properties(height=250, title="Reply Time per Month")
+                                )
+
+                                st.altair_chart(messages_chart, use_container_width=True)
+                                st.altair_chart(reply_trend_chart, use_container_width=True)
+                            except Exception as e:
+                                st.error(f"Error creating trend charts: {e}")
+
+                        # Hour-of-week activity, a row of the precomputed heatmap matrix
+                        activity_df = export['activity_df']
+                        if selected_friend in activity_df.index:
+                            try:
+                                st.altair_chart(
+                                    activity_heatmap(activity_df.loc[selected_friend], "When You Chat"),
+                                    use_container_width=True
+                                )
+                            except Exception as e:
+                                st.error(f"Error creating activity heatmap: {e}")
+
                     except (IndexError, KeyError) as e:
                         st.error(f"Error accessing friend data: {e}")
                 else:
@@ -1,12 +1,16 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import os
+import hashlib
 import re
 import zipfile as zp
-import json
 import altair as alt
 import logging
 
+import ig_ingest
+import ig_metrics
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -298,13 +302,13 @@ st.markdown("""
     <h3>🔒 Privacy & Security</h3>
     <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 1rem; margin-top: 1rem;">
         <div>
-            <strong>🖥️ Local Processing:</strong> Analysis runs entirely in your browser session
+            <strong>🖥️ Processed on the App Host:</strong> Analysis runs on the machine hosting this app; nothing is sent to third parties
         </div>
         <div>
-            <strong>📊 Metadata Only:</strong> Only reads timestamps, participants, and interaction counts
+            <strong>📊 Metadata Only:</strong> Only reads timestamps, participants, and interaction counts; media files and ad data are ignored
         </div>
         <div>
-            <strong>🚫 No Storage:</strong> Media files and ad data are completely ignored
+            <strong>🗂️ Temporary Storage:</strong> Your ZIP is deleted from the app host after a day without use; parsed senders and timestamps are cached there so re-uploads open instantly (set <code>IG_CACHE_MAX_BYTES=0</code> to turn caching off)
         </div>
     </div>
 </div>
@@ -323,7 +327,7 @@ with st.expander("📥 **How to Request & Download Your Instagram Data**", expan
                 <li>Go to <strong>Settings and privacy</strong> → <strong>Your information and permissions</strong></li>
                 <li>Tap <strong>Download your information</strong> → <strong>All of your information</strong></li>
                 <li>Select <strong>JSON</strong> format for better compatibility</li>
-                <li>🎯 <strong>Optional:</strong> Choose a smaller date range for faster processing</li>
+                <li>🎯 <strong>Optional:</strong> Choose a smaller date range for a smaller download (you can also filter by dates here after uploading)</li>
                 <li>Submit request and download the ZIP from your email</li>
                 <li>⚠️ You can skip <strong>Ads/Monetization</strong> files - they're not needed</li>
             </ol>
@@ -356,11 +360,22 @@ with st.expander("📥 **How to Request & Download Your Instagram Data**", expan
 
 # Enhanced file upload section
 st.markdown("## 📂 Upload Your Data")
+# Large exports arrive as several ZIPs; all parts are analyzed as one export
 uploaded_zip = st.file_uploader(
-    "Choose your Instagram data ZIP file", 
+    "Choose your Instagram data ZIP file(s)", 
     type=["zip"],
-    help="Upload the ZIP file Instagram emailed you. No need to unzip it first!"
+    accept_multiple_files=True,
+    help="Upload the ZIP file Instagram emailed you (all parts, if it was split). No need to unzip it first!"
+) or None
+
+# Optional date window; messages outside it are dropped while the export is parsed
+date_window = st.date_input(
+    "📅 Analyze messages between (optional)",
+    value=[],
+    format="YYYY-MM-DD",
+    help="Leave empty to analyze everything. Narrower ranges are faster: messages outside the range are skipped while reading."
 )
+date_range = ig_ingest.date_range_ms(*date_window) if date_window else None
 
 # Sidebar with enhanced styling
 st.sidebar.markdown("""
@@ -370,70 +385,67 @@ st.sidebar.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-def safe_encode_decode(text):
-    """Safely encode and decode text to handle special characters."""
-    try:
-        return text.encode('latin1').decode('utf-8')
-    except (UnicodeEncodeError, UnicodeDecodeError):
-        try:
-            return text.encode('utf-8').decode('utf-8')
-        except (UnicodeEncodeError, UnicodeDecodeError):
-            logger.warning(f"Could not properly decode text: {text}")
-            return str(text)  # Fallback to string conversion
+def spool_upload_once(uploaded_zips):
+    """
+    Spool each uploaded file to disk once; reruns reuse its (hash, path) pair.
+    Returns one hash for the whole set of parts and their paths in hash order.
+    """
+    spooled = st.session_state.setdefault('spooled_uploads', {})
+    for uploaded in uploaded_zips:
+        if uploaded.file_id not in spooled or not os.path.exists(spooled[uploaded.file_id][1]):
+            spooled[uploaded.file_id] = ig_ingest.spool_upload(uploaded)
+    parts = sorted(spooled[uploaded.file_id] for uploaded in uploaded_zips)
+    upload_hash = hashlib.sha256(''.join(part_hash for part_hash, _ in parts).encode()).hexdigest()
+    return upload_hash, [path for _, path in parts]
 
-def calculate_reply_times(messages):
+def ingest_job(upload_hash, zip_paths, username, date_range):
     """
-    Calculate reply times between messages from different participants.
-    Returns: (avg_reply_time, fastest_reply_time, longest_reply_time) in seconds.
+    Start the background ingest for this upload and date range, or reuse the one
+    already running/finished in this session; a job started for other input is cancelled.
     """
-    try:
-        if not messages or len(messages) < 2:
-            return 0, 0, 0
-        
-        reply_times = []
+    key = (upload_hash, date_range)
+    job = st.session_state.get('ingest_job')
+    if job is None or job.key != key:
+        if job is not None:
+            job.cancel()
+        job = ig_ingest.IngestJob(zip_paths, key=key, username=username, date_range=date_range)
+        st.session_state['ingest_job'] = job
+    return job
 
-        # Sort messages by timestamp (oldest first)
-        try:
-            sorted_messages = sorted(messages, key=lambda x: x.get('timestamp_ms', 0))
-        except (KeyError, TypeError) as e:
-            logger.warning(f"Error sorting messages by timestamp: {e}")
-            return 0, 0, 0
+@st.cache_data(show_spinner=False, max_entries=6)
+def preflight_cached(upload_hash, _zip_paths):
+    """Size up an upload from its central directory (WorkEstimate, notices) before parsing it."""
+    return ig_ingest.preflight(_zip_paths)
 
-        for i in range(1, len(sorted_messages)):
-            try:
-                prev_msg = sorted_messages[i - 1]
-                curr_msg = sorted_messages[i]
-
-                # Check if required fields exist
-                if not all(key in prev_msg for key in ['sender_name', 'timestamp_ms']) or \
-                   not all(key in curr_msg for key in ['sender_name', 'timestamp_ms']):
-                    continue
-
-                # Only calculate reply time if it's a different sender replying
-                if prev_msg['sender_name'] != curr_msg['sender_name']:
-                    time_diff_ms = curr_msg['timestamp_ms'] - prev_msg['timestamp_ms']
-                    if time_diff_ms > 0:  # Ensure positive time difference
-                        time_diff_seconds = time_diff_ms / 1000
-                        reply_times.append(time_diff_seconds)
-            except (KeyError, TypeError, ValueError) as e:
-                logger.warning(f"Error processing message pair at index {i}: {e}")
-                continue
-
-        # Calculate statistics
-        if reply_times:
-            try:
-                avg_reply_time = sum(reply_times) / len(reply_times)
-                fastest_reply_time = min(reply_times)
-                longest_reply_time = max(reply_times)
-                return avg_reply_time, fastest_reply_time, longest_reply_time
-            except (ValueError, ZeroDivisionError) as e:
-                logger.warning(f"Error calculating reply time statistics: {e}")
-                return 0, 0, 0
-        else:
-            return 0, 0, 0
-    except Exception as e:
-        logger.error(f"Unexpected error in calculate_reply_times: {e}")
-        return 0, 0, 0
+@st.fragment(run_every=ig_ingest.SNAPSHOT_INTERVAL)
+def ingest_progress(job, work):
+    """
+    Progress of the background ingest and the friends found so far. Only this
+    fragment refreshes while the job runs, so the rest of the page (button results,
+    story likes) stays put; the whole app reruns once when the job is done.
+    """
+    if job.done:
+        st.rerun()
+
+    # Progress is measured in bytes read, so one huge conversation does not stall the bar
+    done, total = job.progress
+    fraction, eta = job.status()
+    eta_text = f" - about **{format_time(eta)}** left" if eta is not None else ""
+    st.progress(
+        fraction,
+        text=f"🔄 Processing **{ig_ingest.format_bytes(work.inbox_bytes)}** of conversations: "
+             f"{fraction:.0%} read, {done:,} of {total:,} done{eta_text} - showing the friends found so far"
+    )
+
+    display_df = job.snapshot()['inbox_df'][['names', 'msgs_count']]
+    display_df.columns = ['Friend Name', 'Total Messages']
+    st.markdown(f"*{len(display_df):,} friends found so far - reply times follow once processing finishes*")
+    st.dataframe(display_df, use_container_width=True, hide_index=True)
+
+@st.cache_data(show_spinner=False, max_entries=6)
+def load_section_cached(upload_hash, section, _zip_paths, date_range=None):
+    """Decode a non-inbox section ('story' or 'connections') the first time a view needs it."""
+    return ig_ingest.load_section(_zip_paths, section, date_range=date_range)
 
 def format_time(seconds):
     """Format seconds into human-readable time format."""
@@ -458,248 +470,94 @@ def format_time(seconds):
     except (ValueError, TypeError):
         return "N/A"
 
-if uploaded_zip is not None:
-    # Processing indicator
-    with st.spinner('🔄 Processing your Instagram data...'):
-        try:
-            with zp.ZipFile(uploaded_zip) as z:
-                try:
-                    # Get top folder name from the ZIP
-                    file_list = z.namelist()
-                    if not file_list:
-                        st.error("❌ The uploaded ZIP file appears to be empty.")
-                        st.stop()
-                    
-                    top_folder = str(uploaded_zip)
-
-                    # Extract username between "instagram-" and "-YYYY-MM-DD"
-                    match = re.search(r"instagram-(.+?)-\d{4}-\d{2}-\d{2}", top_folder)
-                    if match:
-                        raw_username = match.group(1)
-
-                        # Simple encoding: UTF-8 → hex
-                        try:
-                            encoded_username = raw_username.encode("utf-8").hex()
-                            st.success(f"📌 **Detected username:** `{raw_username}`")
-                        except UnicodeEncodeError as e:
-                            logger.warning(f"Error encoding username: {e}")
-                            st.warning("⚠️ Username detected but contains special characters.")
-                    else:
-                        st.error("❌ Could not detect username from folder name.")
-                        st.stop()
-                except Exception as e:
-                    st.error(f"❌ Error reading ZIP file structure: {e}")
-                    st.stop()
 
-                # Target inbox path
-                inbox_path_prefix = "your_instagram_activity/messages/inbox/"
+def activity_heatmap(counts, title):
+    """Day x hour heatmap chart of one row of hour-of-week message counts."""
+    return alt.Chart(ig_metrics.heatmap_cells(counts)).mark_rect(
+        cornerRadius=3
+    ).encode(
+        x=alt.X("hour:O", title=f"Hour of Day ({ig_ingest.TIMEZONE})"),
+        y=alt.Y("day:O", sort=list(ig_metrics.WEEKDAYS), title=""),
+        color=alt.Color("messages:Q", scale=alt.Scale(scheme="purples"), title="Messages"),
+        tooltip=[
+            alt.Tooltip("day:O", title="Day"),
+            alt.Tooltip("hour:O", title="Hour"),
+            alt.Tooltip("messages:Q", title="Messages", format=',')
+        ]
+    ).properties(
+        height=250,
+        title=alt.TitleParams(text=title, fontSize=16, fontWeight='bold')
+    )
 
-                # Collect all `message_1.json` files in subfolders
-                message_jsons = []
-                deactivated_accounts = set()
-                
-                try:
-                    for file_name in z.namelist():
-                        try:
-                            parts = file_name[len(inbox_path_prefix):].split('/')
-
-                            if len(parts) > 1:
-                                folder_name = parts[0]
-                                if folder_name.startswith('instagramuser_'):
-                                    deactivated_accounts.add(folder_name)
-
-                            if file_name.startswith(inbox_path_prefix) and file_name.endswith("message_1.json"):
-                                try:
-                                    with z.open(file_name) as f:
-                                        data = json.load(f)
-                                        if isinstance(data, dict) and 'messages' in data:
-                                            message_jsons.append(data)
-                                        else:
-                                            logger.warning(f"Invalid JSON structure in {file_name}")
-                                except json.JSONDecodeError as e:
-                                    st.warning(f"Invalid JSON in {file_name}: {e}")
-                                except Exception as e:
-                                    st.warning(f"Error reading {file_name}: {e}")
-                        except Exception as e:
-                            logger.warning(f"Error processing file {file_name}: {e}")
-                            continue
-                except Exception as e:
-                    st.error(f"❌ Error scanning ZIP contents: {e}")
-                    st.stop()
-
-                # Initialize data structures
-                Users = {
-                    'names': [],
-                    'msgs_count': [],
-                    'avg_reply_time': [],
-                    'longest_reply_time': [],
-                    'fastest_reply_time': []
-                }
-                
-                groups = 0
-
-                # Process message data with progress
-                try:
-                    if len(message_jsons) > 0:
-                        progress_bar = st.progress(0)
-                        status_text = st.empty()
-                        
-                        for idx, msg in enumerate(message_jsons):
-                            try:
-                                # Update progress
-                                progress = (idx + 1) / len(message_jsons)
-                                progress_bar.progress(progress)
-                                status_text.text(f'Processing conversation {idx + 1} of {len(message_jsons)}...')
-                                
-                                # Check if required fields exist
-                                if 'participants' not in msg or 'messages' not in msg:
-                                    logger.warning("Missing required fields in message JSON")
-                                    continue
-                                    
-                                # Skip group chats
-                                if len(msg['participants']) > 2:
-                                    groups += 1
-                                    continue
-                                    
-                                # Skip Instagram User or empty participants
-                                if (not msg['participants'] or 
-                                    len(msg['participants']) == 0 or 
-                                    msg['participants'][0].get('name') == 'Instagram User'):
-                                    continue
-                                    
-                                participant_name = msg['participants'][0].get('name', 'Unknown')
-                                if participant_name in Users['names'] or participant_name == 'Unknown':
-                                    continue
-                                
-                                # Calculate reply times for this conversation
-                                try:
-                                    avg_reply, fastest_reply, longest_reply = calculate_reply_times(msg['messages'])
-                                except Exception as e:
-                                    logger.warning(f"Error calculating reply times for {participant_name}: {e}")
-                                    avg_reply, fastest_reply, longest_reply = 0, 0, 0
-                                
-                                # Safely decode the name
-                                safe_name = safe_encode_decode(participant_name)
-                                
-                                Users['names'].append(safe_name)
-                                Users['msgs_count'].append(len(msg['messages']))
-                                Users['avg_reply_time'].append(avg_reply)
-                                Users['fastest_reply_time'].append(fastest_reply)
-                                Users['longest_reply_time'].append(longest_reply)
-                                
-                            except Exception as e:
-                                logger.warning(f"Error processing message conversation: {e}")
-                                continue
-                        
-                        # Clear progress indicators
-                        progress_bar.empty()
-                        status_text.empty()
-                    else:
-                        st.warning("⚠️ No message files found in the expected location.")
-                except Exception as e:
-                    st.error(f"❌ Error processing message data: {e}")
-
-                st.info(f"📭 Found **{len(deactivated_accounts)} deactivated accounts** & **{groups} group chats** - skipped from analysis")
-                st.success(f"✅ Successfully processed **{len(message_jsons)}** conversations from your inbox")
-                
-                # Create DataFrame with error handling
-                try:
-                    inbox_df = pd.DataFrame(Users)
-                    if not inbox_df.empty:
-                        inbox_df = inbox_df[inbox_df['avg_reply_time'] != 0]
-                        inbox_df = inbox_df.sort_values(by='msgs_count', ascending=False).reset_index(drop=True)
-                    else:
-                        st.warning("⚠️ No valid conversation data found.")
-                except Exception as e:
-                    st.error(f"❌ Error creating inbox DataFrame: {e}")
-                    inbox_df = pd.DataFrame()
+if uploaded_zip is not None:
+    encoded_username = None
+    try:
+        top_folder = ' '.join(uploaded.name for uploaded in uploaded_zip)
 
-                # Process story interactions
-                story_likes = None
-                story_path = "your_instagram_activity/story_interactions/"
-                
-                try:
-                    for file_name in z.namelist():
-                        if file_name.startswith(story_path) and file_name.endswith("story_likes.json"):
-                            try:
-                                with z.open(file_name) as f:
-                                    data = json.load(f)
-                                    story_likes = data
-                                    break
-                            except json.JSONDecodeError as e:
-                                st.warning(f"Invalid JSON in story likes file: {e}")
-                            except Exception as e:
-                                logger.warning(f"Error reading story likes file: {e}")
-                except Exception as e:
-                    logger.warning(f"Error processing story interactions: {e}")
-                
-                user_by_story = {}
-                story_df = pd.DataFrame()
-                
-                try:
-                    if story_likes and 'story_activities_story_likes' in story_likes:
-                        for user in story_likes['story_activities_story_likes']:
-                            try:
-                                title = user.get('title', 'Unknown')
-                                if title != 'Unknown':
-                                    user_by_story[title] = user_by_story.get(title, 0) + 1
-                            except Exception as e:
-                                logger.warning(f"Error processing story like entry: {e}")
-                                continue
-                        
-                        if user_by_story:
-                            story_df = pd.Series(user_by_story).reset_index().rename(columns={'index': 'User_Name', 0: 'Story_Likes'})
-                            story_df.sort_values(by='Story_Likes', ascending=False, inplace=True)
-                            story_df.reset_index(inplace=True, drop=True)
-                except Exception as e:
-                    logger.warning(f"Error processing story data: {e}")
-                    
-                # Process followers and following data
-                new_path = "connections/followers_and_following/"
-                followers = []
-                followings = {"relationships_following": []}
-                close_friends = {"relationships_close_friends": []}
+        # Extract username between "instagram-" and "-YYYY-MM-DD"
+        match = re.search(r"instagram-(.+?)-\d{4}-\d{2}-\d{2}", top_folder)
+        if match:
+            raw_username = match.group(1)
 
-                try:
-                    for file_name in z.namelist():
-                        try:
-                            if file_name.startswith(new_path):
-                                if file_name.endswith("followers_1.json"):
-                                    try:
-                                        with z.open(file_name) as f:
-                                            data = json.load(f)
-                                            followers = data if isinstance(data, list) else []
-                                    except json.JSONDecodeError as e:
-                                        st.warning(f"Invalid JSON in followers file: {e}")
-                                
-                                elif file_name.endswith("following.json"):
-                                    try:
-                                        with z.open(file_name) as f:
-                                            data = json.load(f)
-                                            followings = data if isinstance(data, dict) else {"relationships_following": []}
-                                    except json.JSONDecodeError as e:
-                                        st.warning(f"Invalid JSON in following file: {e}")
-                                
-                                elif file_name.endswith("close_friends.json"):
-                                    try:
-                                        with z.open(file_name) as f:
-                                            data = json.load(f)
-                                            close_friends = data if isinstance(data, dict) else {"relationships_close_friends": []}
-                                    except json.JSONDecodeError as e:
-                                        st.warning(f"Invalid JSON in close friends file: {e}")
-                        except Exception as e:
-                            logger.warning(f"Error processing connection file {file_name}: {e}")
-                            continue
-                except Exception as e:
-                    logger.warning(f"Error processing connection data: {e}")
+            # Simple encoding: UTF-8 → hex
+            try:
+                encoded_username = raw_username.encode("utf-8").hex()
+                st.success(f"📌 **Detected username:** `{raw_username}`")
+            except UnicodeEncodeError as e:
+                logger.warning(f"Error encoding username: {e}")
+                st.warning("⚠️ Username detected but contains special characters.")
+        else:
+            st.error("❌ Could not detect username from folder name.")
+            st.stop()
+    except Exception as e:
+        st.error(f"❌ Error reading ZIP file structure: {e}")
+        st.stop()
 
+    # Processing runs in the background; every rerun renders its latest (partial) results
+    with st.spinner('🔄 Processing your Instagram data...'):
+        try:
+            upload_hash, zip_paths = spool_upload_once(uploaded_zip)
+            work, preflight_notices = preflight_cached(upload_hash, zip_paths)
+            job = ingest_job(upload_hash, zip_paths, encoded_username, date_range)
+            export = job.wait_snapshot()
+            if job.error is not None:
+                raise job.error
         except zp.BadZipFile:
-            st.error("❌ The uploaded file is not a valid ZIP file or is corrupted.")
+            st.error("❌ An uploaded file is not a valid ZIP file or is corrupted.")
+            st.stop()
+        except ig_ingest.ResourceLimitExceeded as e:
+            st.error(f"❌ {e}")
             st.stop()
         except Exception as e:
             st.error(f"❌ An unexpected error occurred while processing the ZIP file: {e}")
             st.stop()
 
+    partial = export.get('partial', False)
+    if not partial and not export['file_count']:
+        st.error("❌ The uploaded ZIP file appears to be empty.")
+        st.stop()
+
+    for level, text in (preflight_notices if partial else export['notices']):
+        getattr(st, level)(text)
+
+    inbox_df = export['inbox_df']
+
+    # Follower counts are on the dashboard; story likes are only decoded when their view is opened
+    try:
+        connections_df, connection_notices = load_section_cached(upload_hash, 'connections', zip_paths, date_range)
+    except ig_ingest.ResourceLimitExceeded as e:
+        connections_df = pd.DataFrame(columns=['relation', 'username', 'href', 'timestamp'])
+        connection_notices = [('warning', f"⚠️ Followers and following were skipped: {e}")]
+    for level, text in connection_notices:
+        getattr(st, level)(text)
+    relation_counts = connections_df['relation'].value_counts()
+
+    if partial:
+        ingest_progress(job, work)
+    else:
+        st.info(f"📭 Found **{export['deactivated_accounts']} deactivated accounts** & **{export['groups']} group chats** - left out of the friend rankings")
+        st.success(f"✅ Successfully processed **{export['message_files']}** conversations from your inbox")
+
     # Enhanced metrics display
     try:
         st.markdown("## 📊 Your Instagram Stats")
@@ -709,7 +567,7 @@ if uploaded_zip is not None:
         
         with col1:
             try:
-                follower_count = len(followers) if followers else 0
+                follower_count = int(relation_counts.get('followers', 0))
                 st.metric(
                     label="👥 Followers", 
                     value=f"{follower_count:,}", 
@@ -721,7 +579,7 @@ if uploaded_zip is not None:
 
         with col2:
             try:
-                following_count = len(followings.get("relationships_following", [])) if followings else 0
+                following_count = int(relation_counts.get('following', 0))
                 st.metric(
                     label="🔗 Following", 
                     value=f"{following_count:,}", 
@@ -733,7 +591,7 @@ if uploaded_zip is not None:
             
         with col3:
             try:
-                close_friends_count = len(close_friends.get("relationships_close_friends", [])) if close_friends else 0
+                close_friends_count = int(relation_counts.get('close_friends', 0))
                 st.metric(
                     label="💎 Close Friends", 
                     value=f"{close_friends_count:,}", 
@@ -759,23 +617,28 @@ if uploaded_zip is not None:
         st.sidebar.markdown("---")
         
         # Create friends list for dropdown
-        try:
-            friends_list = list(inbox_df['names']) if not inbox_df.empty else []
-            friends_list.insert(0, '🌟 ALL FRIENDS')
-            selected_friend = st.sidebar.selectbox(
-                '🔍 **Filter By Friend**', 
-                friends_list,
-                help="Select a specific friend to view detailed analytics"
-            )
-        except Exception as e:
-            logger.error(f"Error creating friends list: {e}")
+        if partial:
+            # Per-friend views need the reply times, which are scored once processing finishes
             selected_friend = '🌟 ALL FRIENDS'
-            st.sidebar.error("❌ Error loading friends list")
+            st.sidebar.info("⏳ The friend filter and rankings unlock once processing finishes")
+        else:
+            try:
+                friends_list = list(inbox_df['names']) if not inbox_df.empty else []
+                friends_list.insert(0, '🌟 ALL FRIENDS')
+                selected_friend = st.sidebar.selectbox(
+                    '🔍 **Filter By Friend**', 
+                    friends_list,
+                    help="Select a specific friend to view detailed analytics"
+                )
+            except Exception as e:
+                logger.error(f"Error creating friends list: {e}")
+                selected_friend = '🌟 ALL FRIENDS'
+                st.sidebar.error("❌ Error loading friends list")
 
         st.sidebar.markdown("---")
         
         # Enhanced message count filter
-        if not inbox_df.empty:
+        if not inbox_df.empty and not partial:
             min_msgs = st.sidebar.slider(
                 "📊 Minimum Messages",
                 min_value=1,
@@ -783,8 +646,19 @@ if uploaded_zip is not None:
                 value=1,
                 help="Filter friends by minimum message count"
             )
+            ranking_size = st.sidebar.slider(
+                "🏆 Friends per Ranking",
+                min_value=1,
+                max_value=max(50, ig_ingest.RANKING_SIZE),
+                value=ig_ingest.RANKING_SIZE,
+                help="How many friends the Best Friends and Slow Repliers rankings show"
+            )
         else:
             min_msgs = 1
+            ranking_size = ig_ingest.RANKING_SIZE
+
+        # Friends need more than this many messages to be ranked
+        ranking_threshold = max(ig_ingest.RANKING_THRESHOLD, min_msgs - 1)
 
         # Story likes section
         st.sidebar.markdown("### 📸 Story Interactions")
@@ -794,6 +668,9 @@ if uploaded_zip is not None:
             else:
                 with st.expander("👍 **Friends' Stories You Liked**", expanded=True):
                     try:
+                        story_df, story_notices = load_section_cached(upload_hash, 'story', zip_paths, date_range)
+                        for level, text in story_notices:
+                            getattr(st, level)(text)
                         if not story_df.empty:
                             st.markdown("*Showing accounts whose stories you've liked most*")
                             st.dataframe(
@@ -815,16 +692,17 @@ if uploaded_zip is not None:
         
         press_1 = False
         press_2 = False
+        top_df = None
 
         with col1:
-            if st.button("👑 Best Friends", use_container_width=True):
+            if st.button("👑 Best Friends", use_container_width=True, disabled=partial):
                 if uploaded_zip is None:
                     st.sidebar.warning('⚠️ Upload ZIP first')
                 else:
                     press_1 = True
 
         with col2:
-            if st.button("🐌 Slow Repliers", use_container_width=True):
+            if st.button("🐌 Slow Repliers", use_container_width=True, disabled=partial):
                 if uploaded_zip is None:
                     st.sidebar.warning('⚠️ Upload ZIP first')
                 else:
@@ -832,78 +710,84 @@ if uploaded_zip is not None:
         
         # Enhanced analysis results
         try:
+            if press_1 or press_2:
+                # One indexed Top-K query per rerun, shared with the charts below
+                top_df = ig_metrics.top_k(
+                    inbox_df, export['rank_df'], 'avg_reply_time', ranking_size, ranking_threshold, largest=press_2
+                )
+
             if press_1:
                 try:
-                    filtered_df = inbox_df[inbox_df['msgs_count'] >= min_msgs]
-                    new_df = filtered_df[filtered_df['msgs_count'] > 50]
-                    if not new_df.empty:
-                        new_df = new_df.nsmallest(columns='avg_reply_time', n=10)
-                        with st.expander("👑 **Your Top 10 Best Friends** (Fastest Repliers)", expanded=True):
-                            st.markdown("*Friends who reply to you the fastest (minimum 50 messages)*")
+                    if not top_df.empty:
+                        with st.expander(f"👑 **Your Top {ranking_size} Best Friends** (Fastest Repliers)", expanded=True):
+                            st.markdown(f"*Friends who reply to you the fastest (more than {ranking_threshold} messages)*")
                             
                             # Add formatted columns for better display
-                            display_df = new_df.copy()
+                            display_df = top_df.copy()
                             display_df['Avg Reply Time'] = display_df['avg_reply_time'].apply(format_time)
+                            display_df['Median Reply'] = display_df['p50_reply_time'].apply(format_time)
+                            display_df['P90 Reply'] = display_df['p90_reply_time'].apply(format_time)
                             display_df['Fastest Reply'] = display_df['fastest_reply_time'].apply(format_time)
                             display_df['Slowest Reply'] = display_df['longest_reply_time'].apply(format_time)
                             
                             # Select and rename columns for display
-                            display_columns = ['names', 'msgs_count', 'Avg Reply Time', 'Fastest Reply', 'Slowest Reply']
+                            display_columns = ['names', 'msgs_count', 'Avg Reply Time', 'Median Reply', 'P90 Reply', 'Fastest Reply', 'Slowest Reply']
                             display_df = display_df[display_columns]
-                            display_df.columns = ['Friend Name', 'Total Messages', 'Avg Reply Time', 'Fastest Reply', 'Slowest Reply']
+                            display_df.columns = ['Friend Name', 'Total Messages', 'Avg Reply Time', 'Median Reply', 'P90 Reply', 'Fastest Reply', 'Slowest Reply']
                             
                             st.dataframe(display_df, use_container_width=True, hide_index=True)
                     else:
-                        st.warning("⚠️ No friends with more than 50 messages found.")
+                        st.warning(f"⚠️ No friends with more than {ranking_threshold} messages found.")
                 except Exception as e:
                     st.error(f"❌ Error generating best friends analysis: {e}")
 
             elif press_2:
                 try:
-                    filtered_df = inbox_df[inbox_df['msgs_count'] >= min_msgs]
-                    new_df = filtered_df[filtered_df['msgs_count'] > 50]
-                    if not new_df.empty:
-                        new_df = new_df.nlargest(columns='avg_reply_time', n=10)
-                        with st.expander("🐌 **Top 10 Slow Repliers** (Just for Fun!)", expanded=True):
-                            st.markdown("*Friends who take the longest to reply (minimum 50 messages)*")
+                    if not top_df.empty:
+                        with st.expander(f"🐌 **Top {ranking_size} Slow Repliers** (Just for Fun!)", expanded=True):
+                            st.markdown(f"*Friends who take the longest to reply (more than {ranking_threshold} messages)*")
                             st.info("😄 **Note:** This is just for fun - they're still your friends!")
                             
                             # Add formatted columns for better display
-                            display_df = new_df.copy()
+                            display_df = top_df.copy()
                             display_df['Avg Reply Time'] = display_df['avg_reply_time'].apply(format_time)
+                            display_df['Median Reply'] = display_df['p50_reply_time'].apply(format_time)
+                            display_df['P90 Reply'] = display_df['p90_reply_time'].apply(format_time)
                             display_df['Fastest Reply'] = display_df['fastest_reply_time'].apply(format_time)
                             display_df['Slowest Reply'] = display_df['longest_reply_time'].apply(format_time)
                             
                             # Select and rename columns for display
-                            display_columns = ['names', 'msgs_count', 'Avg Reply Time', 'Fastest Reply', 'Slowest Reply']
+                            display_columns = ['names', 'msgs_count', 'Avg Reply Time', 'Median Reply', 'P90 Reply', 'Fastest Reply', 'Slowest Reply']
                             display_df = display_df[display_columns]
-                            display_df.columns = ['Friend Name', 'Total Messages', 'Avg Reply Time', 'Fastest Reply', 'Slowest Reply']
+                            display_df.columns = ['Friend Name', 'Total Messages', 'Avg Reply Time', 'Median Reply', 'P90 Reply', 'Fastest Reply', 'Slowest Reply']
                             
                             st.dataframe(display_df, use_container_width=True, hide_index=True)
                     else:
-                        st.warning("⚠️ No friends with more than 50 messages found.")
+                        st.warning(f"⚠️ No friends with more than {ranking_threshold} messages found.")
                 except Exception as e:
                     st.error(f"❌ Error generating slow repliers analysis: {e}")
             
-            else:
+            elif not partial:
                 with st.expander(f"📊 **Friendship Data** - {selected_friend}", expanded=True):
                     try:
                         if selected_friend == '🌟 ALL FRIENDS':
                             if not inbox_df.empty:
                                 # Apply minimum message filter
-                                filtered_df = inbox_df[inbox_df['msgs_count'] >= min_msgs]
+                                filtered_df = inbox_df.iloc[:ig_metrics.friend_count_above(inbox_df, min_msgs - 1)]
                                 
                                 if not filtered_df.empty:
                                     # Add formatted columns for better display
                                     display_df = filtered_df.copy()
                                     display_df['Avg Reply Time'] = display_df['avg_reply_time'].apply(format_time)
+                                    display_df['Median Reply'] = display_df['p50_reply_time'].apply(format_time)
+                                    display_df['P90 Reply'] = display_df['p90_reply_time'].apply(format_time)
                                     display_df['Fastest Reply'] = display_df['fastest_reply_time'].apply(format_time)
                                     display_df['Slowest Reply'] = display_df['longest_reply_time'].apply(format_time)
                                     
                                     # Select and rename columns for display
-                                    display_columns = ['names', 'msgs_count', 'Avg Reply Time', 'Fastest Reply', 'Slowest Reply']
+                                    display_columns = ['names', 'msgs_count', 'Avg Reply Time', 'Median Reply', 'P90 Reply', 'Fastest Reply', 'Slowest Reply']
                                     display_df = display_df[display_columns]
-                                    display_df.columns = ['Friend Name', 'Total Messages', 'Avg Reply Time', 'Fastest Reply', 'Slowest Reply']
+                                    display_df.columns = ['Friend Name', 'Total Messages', 'Avg Reply Time', 'Median Reply', 'P90 Reply', 'Fastest Reply', 'Slowest Reply']
                                     
                                     st.markdown(f"*Showing {len(display_df)} friends with {min_msgs}+ messages*")
                                     st.dataframe(display_df, use_container_width=True, hide_index=True)
@@ -918,13 +802,15 @@ if uploaded_zip is not None:
                                 # Add formatted columns for better display
                                 display_df = filtered_df.copy()
                                 display_df['Avg Reply Time'] = display_df['avg_reply_time'].apply(format_time)
+                                display_df['Median Reply'] = display_df['p50_reply_time'].apply(format_time)
+                                display_df['P90 Reply'] = display_df['p90_reply_time'].apply(format_time)
                                 display_df['Fastest Reply'] = display_df['fastest_reply_time'].apply(format_time)
                                 display_df['Slowest Reply'] = display_df['longest_reply_time'].apply(format_time)
                                 
                                 # Select and rename columns for display
-                                display_columns = ['names', 'msgs_count', 'Avg Reply Time', 'Fastest Reply', 'Slowest Reply']
+                                display_columns = ['names', 'msgs_count', 'Avg Reply Time', 'Median Reply', 'P90 Reply', 'Fastest Reply', 'Slowest Reply']
                                 display_df = display_df[display_columns]
-                                display_df.columns = ['Friend Name', 'Total Messages', 'Avg Reply Time', 'Fastest Reply', 'Slowest Reply']
+                                display_df.columns = ['Friend Name', 'Total Messages', 'Avg Reply Time', 'Median Reply', 'P90 Reply', 'Fastest Reply', 'Slowest Reply']
                                 
                                 st.dataframe(display_df, use_container_width=True, hide_index=True)
                             else:
@@ -949,13 +835,11 @@ try:
 
         try:
             if press_1:
-                st.markdown("### 👑 Top 10 Best Friends (Fastest Repliers)")
-                st.markdown("*These friends reply to your messages the quickest (minimum 50 messages)*")
+                st.markdown(f"### 👑 Top {ranking_size} Best Friends (Fastest Repliers)")
+                st.markdown(f"*These friends reply to your messages the quickest (more than {ranking_threshold} messages)*")
                 
-                new_df = inbox_df[inbox_df['msgs_count'] > 50]
+                new_df = top_df
                 if not new_df.empty:
-                    new_df = new_df.nsmallest(columns='avg_reply_time', n=10)
-
                     try:
                         # Create enhanced chart with better styling
                         base_chart = alt.Chart(new_df).add_params(
@@ -1013,14 +897,12 @@ try:
 
             if press_2:
                 st.markdown("---")
-                st.markdown("### 🐌 Top 10 Slow Repliers")
-                st.markdown("*Friends who take longer to reply (minimum 50 messages)*")
+                st.markdown(f"### 🐌 Top {ranking_size} Slow Repliers")
+                st.markdown(f"*Friends who take longer to reply (more than {ranking_threshold} messages)*")
                 st.info("😄 **Remember:** This is just for fun - response time doesn't measure friendship quality!")
                 
-                new_df = inbox_df[inbox_df['msgs_count'] > 50]
+                new_df = top_df
                 if not new_df.empty:
-                    new_df = new_df.nlargest(columns='avg_reply_time', n=10)
-
                     try:
                         # Create enhanced chart for slow repliers
                         base_chart = alt.Chart(new_df).add_params(
@@ -1079,7 +961,7 @@ try:
             st.error(f"❌ Error in friendship insights display: {e}")
 
     # Individual friend detailed analysis
-    if uploaded_zip is not None and selected_friend != '🌟 ALL FRIENDS' and not (press_1 or press_2):
+    if uploaded_zip is not None and selected_friend != '🌟 ALL FRIENDS' and not (press_1 or press_2 or partial):
         try:
             clean_friend_name = selected_friend.replace('🌟 ', '')
             
@@ -1175,6 +1057,153 @@ try:
                         )
 
                         st.altair_chart(chart, use_container_width=True)
+
+                        # Reply time distribution, read from the friend's reply-time sketch
+                        reply_sketch_df = export['reply_sketch_df']
+                        friend_sketch = reply_sketch_df[reply_sketch_df['key'] == clean_friend_name]
+                        if not friend_sketch.empty:
+                            histogram_df = (
+                                ig_metrics.sketch_histogram(friend_sketch).iloc[0]
+                                .rename_axis('Reply Time').reset_index(name='Replies')
+                            )
+                            histogram_chart = alt.Chart(histogram_df).mark_bar(
+                                cornerRadius=6,
+                                color='#4682B4'
+                            ).encode(
+                                x=alt.X("Reply Time:N",
+                                       sort=list(ig_metrics.REPLY_TIME_LABELS),
+                                       title="Reply Time",
+                                       axis=alt.Axis(labelAngle=0)),
+                                y=alt.Y("Replies:Q", title="Number of Replies"),
+                                tooltip=[
+                                    alt.Tooltip("Reply Time:N", title="Reply Time"),
+                                    alt.Tooltip("Replies:Q", title="Replies", format=',')
+                                ]
+                            ).properties(
+                                height=250,
+                                title=alt.TitleParams(
+                                    text=f"Reply Time Distribution for {clean_friend_name}",
+                                    fontSize=16,
+                                    fontWeight='bold'
+                                )
+                            )
+                            st.altair_chart(histogram_chart, use_container_width=True)
+                            st.caption(
+                                f"Half of the replies come within {format_time(row['p50_reply_time'])}, "
+                                f"90% within {format_time(row['p90_reply_time'])} and "
+                                f"99% within {format_time(row['p99_reply_time'])}."
+                            )
+
+                        # Conversation sessions: messages split at long silences
+                        threads_df = export['threads_df']
+                        sessions_df = export['sessions_df']
+                        friend_sessions = sessions_df[
+                            sessions_df['thread_id'].isin(threads_df.index[threads_df['friend'] == clean_friend_name])
+                        ]
+                        if not friend_sessions.empty:
+                            st.markdown("### 💬 Conversation Sessions")
+                            st.markdown(f"*A conversation ends after {format_time(ig_ingest.SESSION_GAP_SECONDS)} of silence*")
+
+                            session_replies = friend_sessions['reply_count'].sum()
+                            in_session_reply = (
+                                (friend_sessions['avg_reply_time'] * friend_sessions['reply_count']).sum() / session_replies
+                                if session_replies else 0
+                            )
+                            initiators = export['senders_df']['sender_name'].reindex(friend_sessions['initiator_id'])
+                            friend_side = threads_df['name'].reindex(friend_sessions['thread_id'])
+                            started_by_friend = (initiators.to_numpy() == friend_side.to_numpy()).mean() * 100
+
+                            session_cols = st.columns(4)
+                            with session_cols[0]:
+                                st.metric(
+                                    label="🗂️ Conversations",
+                                    value=f"{len(friend_sessions):,}",
+                                    help="Separate conversations with this friend"
+                                )
+                            with session_cols[1]:
+                                st.metric(
+                                    label="⏳ Avg Conversation Length",
+                                    value=format_time(friend_sessions['duration'].mean()),
+                                    help="Time from the first to the last message of a conversation"
+                                )
+                            with session_cols[2]:
+                                st.metric(
+                                    label="📨 Messages per Conversation",
+                                    value=f"{friend_sessions['msgs_count'].mean():,.1f}",
+                                    help="Average number of messages in a conversation"
+                                )
+                            with session_cols[3]:
+                                st.metric(
+                                    label="💨 In-Conversation Reply",
+                                    value=format_time(in_session_reply),
+                                    help="Average reply time within a conversation, ignoring replies after a long silence"
+                                )
+                            st.caption(f"{clean_friend_name} started {started_by_friend:.0f}% of your conversations.")
+
+                        # Trends over time, a slice of the friend x month x direction rollup cube
+                        cube_df = export['cube_df']
+                        trend_df = cube_df[cube_df['friend'] == clean_friend_name]
+                        if not trend_df.empty:
+                            st.markdown("### 📈 Trends Over Time")
+                            trend_df = trend_df.assign(
+                                direction=trend_df['direction'].map({'received': f"From {clean_friend_name}", 'sent': "From you"}),
+                                avg_reply_time=trend_df['reply_time_sum'] / trend_df['reply_count'].where(trend_df['reply_count'] > 0),
+                            )
+                            direction_colors = alt.Scale(
+                                domain=[f"From {clean_friend_name}", "From you"],
+                                range=["#4682B4", "#2E8B57"]
+                            )
+
+                            messages_trend = alt.Chart(trend_df).mark_bar(
+                                cornerRadiusTopLeft=4,
+                                cornerRadiusTopRight=4
+                            ).encode(
+                                x=alt.X("yearmonth(month):T", title="Month"),
+                                y=alt.Y("msgs_count:Q", title="Messages", stack=True),
+                                color=alt.Color("direction:N", scale=direction_colors, title=""),
+                                tooltip=[
+                                    alt.Tooltip("yearmonth(month):T", title="Month"),
+                                    alt.Tooltip("direction:N", title="Direction"),
+                                    alt.Tooltip("msgs_count:Q", title="Messages", format=',')
+                                ]
+                            ).properties(
+                                height=250,
+                                title=alt.TitleParams(text="Messages per Month", fontSize=16, fontWeight='bold')
+                            )
+
+                            reply_trend = alt.Chart(trend_df.dropna(subset=['avg_reply_time'])).mark_line(
+                                point=True,
+                                strokeWidth=3
+                            ).encode(
+                                x=alt.X("yearmonth(month):T", title="Month"),
+                                y=alt.Y("avg_reply_time:Q", title="Average Reply Time (seconds)"),
+                                color=alt.Color("direction:N", scale=direction_colors, title=""),
+                                tooltip=[
+                                    alt.Tooltip("yearmonth(month):T", title="Month"),
+                                    alt.Tooltip("direction:N", title="Direction"),
+                                    alt.Tooltip("avg_reply_time:Q", title="Avg Reply Time (s)", format='.1f'),
+                                    alt.Tooltip("p50_reply_time:Q", title="Median Reply Time (s)", format='.1f'),
+                                    alt.Tooltip("p90_reply_time:Q", title="P90 Reply Time (s)", format='.1f')
+                                ]
+                            ).properties(
+                                height=250,
+                                title=alt.TitleParams(text="Reply Time per Month", fontSize=16, fontWeight='bold')
+                            )
+
+                            trend_cols = st.columns(2)
+                            with trend_cols[0]:
+                                st.altair_chart(messages_trend, use_container_width=True)
+                            with trend_cols[1]:
+                                st.altair_chart(reply_trend, use_container_width=True)
+
+                        # Hour-of-week activity, a row of the precomputed heatmap matrix
+                        activity_df = export['activity_df']
+                        if clean_friend_name in activity_df.index:
+                            st.markdown("### 🕐 When You Chat")
+                            st.altair_chart(
+                                activity_heatmap(activity_df.loc[clean_friend_name], f"Messages with {clean_friend_name} by Hour of the Week"),
+                                use_container_width=True
+                            )
                         
                         # Add friendship insights
                         st.markdown("### 💡 Friendship Insights")
@@ -1246,7 +1275,7 @@ try:
             st.error(f"❌ Error displaying individual friend analysis: {e}")
 
     # Overview analytics section
-    if uploaded_zip is not None and selected_friend == '🌟 ALL FRIENDS' and not (press_1 or press_2):
+    if uploaded_zip is not None and selected_friend == '🌟 ALL FRIENDS' and not (press_1 or press_2 or partial):
         try:
             if not inbox_df.empty:
                 st.markdown("---")
@@ -1263,7 +1292,7 @@ try:
                 with col1:
                     # Message count distribution
                     try:
-                        filtered_df = inbox_df[inbox_df['msgs_count'] >= min_msgs].head(20)
+                        filtered_df = inbox_df.iloc[:ig_metrics.friend_count_above(inbox_df, min_msgs - 1)].head(20)
                         
                         if not filtered_df.empty:
                             msg_chart = alt.Chart(filtered_df).mark_bar(
@@ -1294,7 +1323,7 @@ try:
                 with col2:
                     # Reply time distribution
                     try:
-                        reply_time_df = inbox_df[inbox_df['msgs_count'] >= min_msgs].head(20)
+                        reply_time_df = inbox_df.iloc[:ig_metrics.friend_count_above(inbox_df, min_msgs - 1)].head(20)
                         
                         if not reply_time_df.empty:
                             reply_chart = alt.Chart(reply_time_df).mark_bar(
@@ -1322,6 +1351,15 @@ try:
                     except Exception as e:
                         st.error(f"Error creating reply time chart: {e}")
                 
+                # Hour-of-week activity over every conversation
+                try:
+                    st.altair_chart(
+                        activity_heatmap(export['all_activity_df'].iloc[0], "Your Messages by Hour of the Week"),
+                        use_container_width=True
+                    )
+                except Exception as e:
+                    st.error(f"Error creating activity heatmap: {e}")
+
                 # Summary statistics
                 st.markdown("### 📊 Your Messaging Summary")
                 
@@ -1343,6 +1381,52 @@ try:
                     fastest_replier = inbox_df.loc[inbox_df['avg_reply_time'].idxmin(), 'names']
                     st.metric("⚡ Fastest Replier", fastest_replier)
                 
+                # Group chats: who replies to whom, from the sparse reply matrix
+                group_replies_df = export['group_replies_df']
+                if not group_replies_df.empty:
+                    try:
+                        st.markdown("### 👥 Group Chats")
+                        group_ids = pd.unique(group_replies_df['thread_id'])
+                        group_labels = ig_ingest.group_chat_labels(export['threads_df'], group_ids)
+                        selected_group = st.selectbox(
+                            "Group chat",
+                            ['All group chats'] + group_labels,
+                            help="Replies counted within the selected group chat, or across all of them"
+                        )
+                        members_df, pairs_df = ig_ingest.group_chat_stats(
+                            group_replies_df, export['senders_df'],
+                            None if selected_group == 'All group chats' else [group_ids[group_labels.index(selected_group)]]
+                        )
+
+                        group_col1, group_col2 = st.columns(2)
+                        with group_col1:
+                            st.markdown("**⚡ Member Responsiveness**")
+                            display_df = members_df.copy()
+                            display_df['avg_reply_time'] = display_df['avg_reply_time'].apply(format_time)
+                            display_df.columns = ['Member', 'Replies Sent', 'Avg Reply Time', 'Replies Received', 'Replied To']
+                            st.dataframe(display_df, use_container_width=True, hide_index=True)
+                        with group_col2:
+                            top_pairs = pairs_df.head(10).assign(pair=lambda df: df['member_a'] + " ↔ " + df['member_b'])
+                            affinity_chart = alt.Chart(top_pairs).mark_bar(
+                                cornerRadius=4
+                            ).encode(
+                                x=alt.X("affinity:Q", title="Affinity", axis=alt.Axis(format='%')),
+                                y=alt.Y("pair:N", title="", sort=alt.EncodingSortField(field="affinity", order="descending")),
+                                color=alt.Color("affinity:Q", scale=alt.Scale(scheme="purples"), legend=None),
+                                tooltip=[
+                                    alt.Tooltip("pair:N", title="Members"),
+                                    alt.Tooltip("reply_count:Q", title="Replies Between Them"),
+                                    alt.Tooltip("avg_reply_time:Q", title="Avg Reply Time (s)", format='.1f'),
+                                    alt.Tooltip("affinity:Q", title="Affinity", format='.0%')
+                                ]
+                            ).properties(
+                                height=300,
+                                title="Closest Pairs (share of their replies that go to each other)"
+                            )
+                            st.altair_chart(affinity_chart, use_container_width=True)
+                    except Exception as e:
+                        st.error(f"Error displaying group chat analytics: {e}")
+
         except Exception as e:
             st.error(f"❌ Error displaying overview analytics: {e}")
 
@@ -1364,10 +1448,10 @@ if uploaded_zip is not None:
                 <strong>📊 Message Counts:</strong> Total messages in each conversation thread, including both sent and received.
             </div>
             <div>
-                <strong>🎯 Data Scope:</strong> Analysis limited to the timeframe of your Instagram data export request.
+                <strong>🎯 Data Scope:</strong> Analysis limited to the timeframe of your Instagram data export request, or to the date range you picked above.
             </div>
             <div>
-                <strong>🔒 Privacy:</strong> All processing happens locally in your browser - no data is stored or transmitted.
+                <strong>🔒 Privacy:</strong> Processing happens on the app host. Uploads are deleted after a day without use and parsed metadata stays cached there until evicted - set <code>IG_CACHE_MAX_BYTES=0</code> to turn caching off.
             </div>
         </div>
     </div>
@@ -1379,7 +1463,7 @@ with st.expander("💡 **Tips & Tricks for Better Analysis**"):
     <div class="feature-card">
         <h4>🎯 Getting the Best Results</h4>
         <ul>
-            <li><strong>📅 Date Range:</strong> For comprehensive analysis, request "All time" data when downloading from Instagram</li>
+            <li><strong>📅 Date Range:</strong> For comprehensive analysis, request "All time" data when downloading from Instagram, then use the date range picker to focus on any period - shorter ranges load faster</li>
             <li><strong>📊 Minimum Messages:</strong> Use the sidebar filter to focus on meaningful conversations (e.g., 50+ messages)</li>
             <li><strong>🔍 Individual Analysis:</strong> Select specific friends from the dropdown for detailed insights</li>
             <li><strong>📱 Mobile vs Desktop:</strong> Both download methods work equally well - choose what's convenient for you</li>
@@ -1388,7 +1472,7 @@ with st.expander("💡 **Tips & Tricks for Better Analysis**"):
         <h4>🤔 Understanding Your Data</h4>
         <ul>
             <li><strong>Reply Times:</strong> Based on actual message timestamps, not read receipts</li>
-            <li><strong>Group Chats:</strong> Automatically excluded to focus on 1-on-1 friendships</li>
+            <li><strong>Group Chats:</strong> Kept out of the friend rankings; see who replies to whom in the Group Chats section of the overview</li>
             <li><strong>Deactivated Accounts:</strong> Filtered out as they can't reply anymore</li>
             <li><strong>Story Interactions:</strong> Shows stories you've liked, indicating your engagement level</li>
         </ul>
@@ -1397,6 +1481,10 @@ with st.expander("💡 **Tips & Tricks for Better Analysis**"):
 
 # Final call-to-action if no file uploaded
 if uploaded_zip is None:
+    # Removing the upload stops any ingest still running for it
+    job = st.session_state.pop('ingest_job', None)
+    if job is not None:
+        job.cancel()
     st.markdown("---")
     st.markdown("""
     <div style="text-align: center; padding: 2rem; background: linear-gradient(135deg, rgba(102, 126, 234, 0.1), rgba(118, 75, 162, 0.1)); border-radius: 16px; margin: 2rem 0;">
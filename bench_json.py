@@ -0,0 +1,76 @@
+"""
+Benchmark the JSON decoder backends on a real Instagram export.
+
+Usage: python bench_json.py EXPORT [EXPORT ...] [--repeat N]
+
+EXPORT is a ZIP (or an extracted export folder); several parts of a split export
+may be given. Member bytes are read into memory first, so only decoding is timed.
+Each file category is decoded with every available backend and the best of N runs
+is reported with throughput and speedup over the stdlib.
+"""
+import argparse
+import io
+import json
+import time
+
+import ig_ingest
+
+
+def best_time(fn, payloads, repeat):
+    """Best wall-clock time of `repeat` runs of fn over every payload."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for data in payloads:
+            fn(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def read_payloads(sources):
+    """Raw member bytes of the export per manifest category (inbox, story, connection)."""
+    with ig_ingest.open_archive(sources) as z:
+        manifest = ig_ingest.build_manifest(z)
+        payloads = {}
+        for category in (ig_ingest.INBOX, ig_ingest.STORY, ig_ingest.CONNECTION):
+            payloads[category] = []
+            for entry in manifest['entries'][category]:
+                with z.open(entry.name) as f:
+                    payloads[category].append(f.read())
+    return payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON decoder backends per export file category.")
+    parser.add_argument('exports', nargs='+', help="export ZIP(s) or extracted export folder(s)")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per measurement; the best is reported")
+    args = parser.parse_args()
+
+    payloads = read_payloads(args.exports)
+
+    decoders = {'json': json.loads}
+    if ig_ingest.orjson is not None:
+        decoders['orjson'] = ig_ingest.orjson.loads
+    else:
+        print("orjson is not installed; only the stdlib backend is measured")
+
+    print(f"{'category':<12}{'files':>7}{'MB':>9}  {'decoder':<16}{'seconds':>10}{'MB/s':>10}{'speedup':>9}")
+    for category, data in payloads.items():
+        if not data:
+            continue
+        size_mb = sum(len(d) for d in data) / 1024 ** 2
+        timings = {name: best_time(loads, data, args.repeat) for name, loads in decoders.items()}
+        if category == ig_ingest.INBOX:
+            # What the ingest does per part: decode whole and project (up to WHOLE_DOCUMENT_MAX_BYTES), or stream
+            timings['parse_thread'] = best_time(ig_ingest.parse_thread, data, args.repeat)
+            timings['stream_thread'] = best_time(
+                lambda d: ig_ingest.stream_thread(io.BytesIO(d)), data, args.repeat
+            )
+        baseline = timings['json']
+        for name, seconds in timings.items():
+            print(f"{category:<12}{len(data):>7}{size_mb:>9.2f}  {name:<16}{seconds:>10.4f}"
+                  f"{size_mb / seconds:>10.1f}{baseline / seconds:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1783 @@
+import codecs
+import hashlib
+import io
+import json
+import logging
+import mmap
+import multiprocessing
+import os
+import re
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zipfile as zp
+from array import array
+from datetime import datetime, timedelta
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager, suppress
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+import pandas as pd
+
+from ig_metrics import (
+    HOUR_OF_WEEK_LABELS, MISSING, TYPE_CALL, TYPE_MEDIA, TYPE_OTHER, TYPE_SHARE, TYPE_TEXT,
+    activity_heatmaps, build_rank_index, build_rollup_cube, build_sessions_df, friend_metrics, group_reply_matrix,
+    member_responsiveness, pair_affinity, sketch_quantiles, thread_bounds,
+)
+
+try:
+    import orjson
+except ImportError:  # optional accelerated JSON decoder
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Locations inside the Instagram export
+INBOX_PATH_PREFIX = "your_instagram_activity/messages/inbox/"
+STORY_PATH = "your_instagram_activity/story_interactions/"
+CONNECTIONS_PATH = "connections/followers_and_following/"
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Uploads are spooled here as <sha256>.zip and removed after SPOOL_MAX_AGE seconds without use
+SPOOL_DIR = os.environ.get('IG_SPOOL_DIR') or os.path.join(tempfile.gettempdir(), 'ig-friendship-analyzer')
+SPOOL_MAX_AGE = int(os.environ.get('IG_SPOOL_MAX_AGE', 24 * 3600))
+
+# Persistent parse cache: one directory of Parquet tables per export, evicted LRU past the byte budget
+CACHE_DIR = os.environ.get('IG_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'ig-friendship-analyzer')
+CACHE_MAX_BYTES = int(os.environ.get('IG_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+CACHE_VERSION = 9
+CACHE_TABLES = {
+    'messages_df': 'messages', 'threads_df': 'threads', 'senders_df': 'senders',
+    'inbox_df': 'inbox', 'reply_sketch_df': 'reply_sketch', 'sessions_df': 'sessions',
+    'cube_df': 'cube', 'activity_df': 'activity', 'all_activity_df': 'all_activity', 'rank_df': 'ranks',
+    'group_replies_df': 'group_replies',
+}
+CACHE_FIELDS = ('file_count', 'deactivated_accounts', 'groups', 'message_files', 'notices')
+
+# Ingest engine: worker count (1 = serial) and the inbox size below which a process pool is not worth starting
+INGEST_WORKERS = int(os.environ.get('IG_INGEST_WORKERS', os.cpu_count() or 1))
+PROCESS_POOL_MIN_BYTES = int(os.environ.get('IG_PROCESS_POOL_MIN_BYTES', 64 * 1024 * 1024))
+
+# JSON decoder backend: 'auto' (orjson when installed, else stdlib), 'orjson' or 'json'
+JSON_BACKEND = os.environ.get('IG_JSON_BACKEND', 'auto')
+# Inbox parts up to this size (Instagram writes parts of a few MB) are decoded whole, which is
+# fastest; larger parts are streamed so memory stays bounded (0 = always stream)
+WHOLE_DOCUMENT_MAX_BYTES = int(os.environ.get('IG_WHOLE_DOCUMENT_MAX_BYTES', 8 * 1024 * 1024))
+
+# Pre-flight limits on the uncompressed bytes an export asks us to parse (0 = no limit):
+# above WORK_WARN_BYTES the user is warned, above WORK_MAX_BYTES the ingest is refused
+WORK_WARN_BYTES = int(os.environ.get('IG_WORK_WARN_BYTES', 1024 ** 3))
+WORK_MAX_BYTES = int(os.environ.get('IG_WORK_MAX_BYTES', 8 * 1024 ** 3))
+
+# Guardrails against hostile or oversized uploads (0 = no limit): archive entries, the size of one
+# parsed member, messages in one thread and wall-clock seconds for one ingest stage
+MAX_ENTRIES = int(os.environ.get('IG_MAX_ENTRIES', 200_000))
+MAX_MEMBER_BYTES = int(os.environ.get('IG_MAX_MEMBER_BYTES', 512 * 1024 * 1024))
+MAX_MESSAGES_PER_THREAD = int(os.environ.get('IG_MAX_MESSAGES_PER_THREAD', 2_000_000))
+STAGE_TIME_BUDGET = float(os.environ.get('IG_STAGE_TIME_BUDGET', 600))
+
+# Background ingest: seconds between partial inbox snapshots published by an IngestJob
+SNAPSHOT_INTERVAL = float(os.environ.get('IG_SNAPSHOT_INTERVAL', 0.5))
+
+# A silence longer than this many seconds ends a conversation session (see ig_metrics.build_sessions_df)
+SESSION_GAP_SECONDS = int(os.environ.get('IG_SESSION_GAP', 3600))
+
+# Friend rankings (Top-K views): how many friends are shown, and how many messages a friend
+# needs beyond this threshold to be ranked at all
+RANKING_SIZE = int(os.environ.get('IG_RANKING_SIZE', 10))
+RANKING_THRESHOLD = int(os.environ.get('IG_RANKING_THRESHOLD', 50))
+
+# IANA time zone for calendar months and hours of the week in the trend and activity views
+TIMEZONE = os.environ.get('IG_TIMEZONE', 'UTC')
+try:
+    ZoneInfo(TIMEZONE)
+except (ZoneInfoNotFoundError, ValueError):
+    logger.warning(f"Unknown time zone IG_TIMEZONE={TIMEZONE!r}, using UTC")
+    TIMEZONE = 'UTC'
+
+# Manifest categories for every entry of the archive
+INBOX = 'inbox'
+STORY = 'story'
+CONNECTION = 'connection'
+IGNORED = 'ignored'
+CATEGORIES = (INBOX, STORY, CONNECTION, IGNORED)
+
+MESSAGE_PART_RE = re.compile(r"message_(\d+)\.json$")
+# Inbox folders are named <username>_<thread number>; the username identifies the friend
+FOLDER_HANDLE_RE = re.compile(r"(.+)_\d+$")
+# Lone surrogates left by a surrogateescape decode mark bytes that were not valid UTF-8
+_UNDECODABLE_RE = re.compile('[\udc80-\udcff]')
+STORY_FILES = {"story_likes.json": "story_likes"}
+CONNECTION_FILES = {
+    "followers_1.json": "followers",
+    "following.json": "following",
+    "close_friends.json": "close_friends",
+}
+# Where each connection file keeps its entries (None: the document is the list itself)
+CONNECTION_LIST_KEYS = {
+    'followers': None,
+    'following': 'relationships_following',
+    'close_friends': 'relationships_close_friends',
+}
+
+# Work an export asks for, from its central directory: uncompressed bytes per section
+WorkEstimate = namedtuple(
+    'WorkEstimate', ['threads', 'inbox_bytes', 'story_bytes', 'connection_bytes', 'total_bytes', 'largest_member']
+)
+
+
+class IngestCancelled(Exception):
+    """Raised inside load_export when its `cancel` event is set."""
+
+
+class ResourceLimitExceeded(Exception):
+    """Raised when an upload trips one of the guardrails; the ingest stage is aborted."""
+
+
+class WorkLimitExceeded(ResourceLimitExceeded):
+    """Raised before parsing when an export needs more work than WORK_MAX_BYTES allows."""
+
+
+# One archive member; `key` is the inbox folder for thread parts or the section name otherwise
+ManifestEntry = namedtuple(
+    'ManifestEntry', ['name', 'category', 'key', 'part', 'compress_size', 'file_size', 'crc']
+)
+
+# Compact per-thread outcome handed back by the ingest workers: participant names and the
+# thread's message columns (sender codes into sender_names, timestamps and type codes)
+ThreadResult = namedtuple(
+    'ThreadResult', ['folder', 'participants', 'sender_names', 'sender_codes', 'timestamps', 'type_codes']
+)
+
+# Message keys that decide the type code, checked in order; a message with none of them is TYPE_OTHER
+MESSAGE_TYPE_KEYS = (
+    ('call_duration', TYPE_CALL),
+    ('share', TYPE_SHARE),
+    ('photos', TYPE_MEDIA), ('videos', TYPE_MEDIA), ('audio_files', TYPE_MEDIA),
+    ('gifs', TYPE_MEDIA), ('files', TYPE_MEDIA), ('sticker', TYPE_MEDIA),
+    ('content', TYPE_TEXT),
+)
+
+# Active JSON backend name and its bytes -> object decoder (see set_json_backend)
+_json_backend = None
+_json_loads = None
+
+# Archive (and the stack holding its files/maps) opened once per process-pool worker
+_worker_zip = None
+_worker_stack = None
+
+
+def repair_mojibake(values, label='strings'):
+    """
+    Undo Instagram's mojibake (UTF-8 bytes escaped as one latin-1 code point each)
+    over a whole column of strings at once. Only distinct non-ASCII strings whose
+    code points all fit in latin-1 are candidates; they are joined, re-encoded and
+    decoded in a single pass, and a string is replaced only if its bytes were valid
+    UTF-8, so correct text (e.g. "café") is left alone. Cost is linear in the size
+    of the distinct strings and is logged under `label`.
+    Returns a list in input order; non-string values pass through unchanged.
+    """
+    start = time.perf_counter()
+    distinct = {value for value in values if isinstance(value, str) and not value.isascii()}
+    candidates = [value for value in distinct if '\0' not in value and max(value) <= '\xff']
+    repaired = {}
+    if candidates:
+        decoded = '\0'.join(candidates).encode('latin1').decode('utf-8', 'surrogateescape').split('\0')
+        repaired = {
+            original: text for original, text in zip(candidates, decoded)
+            if not _UNDECODABLE_RE.search(text)
+        }
+    result = [repaired.get(value, value) if isinstance(value, str) else value for value in values]
+    logger.debug(
+        f"Mojibake repair ({label}): {len(repaired)} of {len(distinct)} non-ASCII distinct values fixed "
+        f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+    return result
+
+
+def date_range_ms(start_date=None, end_date=None):
+    """
+    Turn an inclusive range of calendar dates (either end optional) into the
+    (start_ms, end_ms) window used by the ingest, end exclusive. Days start at
+    midnight in TIMEZONE, like the months and hours the views bucket by.
+    None if unbounded.
+    """
+    if start_date is None and end_date is None:
+        return None
+    return (
+        None if start_date is None else _midnight_ms(start_date),
+        None if end_date is None else _midnight_ms(end_date + timedelta(days=1)),
+    )
+
+
+def normalize_date_range(date_range):
+    """A (start_ms, end_ms) window as a tuple, or None when both bounds are open; cache keys depend on it."""
+    if date_range is None or all(bound is None for bound in date_range):
+        return None
+    return tuple(date_range)
+
+
+def _midnight_ms(day):
+    return int(datetime(day.year, day.month, day.day, tzinfo=ZoneInfo(TIMEZONE)).timestamp() * 1000)
+
+
+def project_messages(messages, date_range=None):
+    """
+    Keep only the fields the metrics use from raw messages: a list of
+    (sender_name, timestamp_ms, type code) tuples, None when missing, one per
+    dict message. With date_range = (start_ms, end_ms), end exclusive, either
+    bound None for open, messages outside it or without a numeric timestamp
+    (which cannot be placed) are dropped. One pass with no call per message:
+    this loop sees every message of the export.
+    """
+    if date_range is not None:
+        start, end = date_range
+        start = float('-inf') if start is None else start
+        end = float('inf') if end is None else end
+    projected = []
+    append = projected.append
+    for msg in messages:
+        if not isinstance(msg, dict):
+            continue
+        timestamp = msg.get('timestamp_ms')
+        if date_range is not None and not (isinstance(timestamp, (int, float)) and start <= timestamp < end):
+            continue
+        for key, type_code in MESSAGE_TYPE_KEYS:
+            if key in msg:
+                break
+        else:
+            type_code = TYPE_OTHER
+        append((msg.get('sender_name'), timestamp, type_code))
+    return projected
+
+
+def spool_upload(uploaded_file):
+    """
+    Copy an uploaded file into SPOOL_DIR in chunks, hashing it on the way.
+    The spool file is named after the content hash, so re-uploads reuse it.
+    Returns (sha256_hex, path).
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    prune_spool()
+
+    digest = hashlib.sha256()
+    fd, part_path = tempfile.mkstemp(dir=SPOOL_DIR, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            uploaded_file.seek(0)
+            for chunk in iter(lambda: uploaded_file.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                out.write(chunk)
+        upload_hash = digest.hexdigest()
+        path = os.path.join(SPOOL_DIR, f"{upload_hash}.zip")
+        os.replace(part_path, path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    finally:
+        uploaded_file.seek(0)
+
+    return upload_hash, path
+
+
+def prune_spool(max_age=None):
+    """Delete spooled uploads that have not been used for `max_age` seconds."""
+    max_age = SPOOL_MAX_AGE if max_age is None else max_age
+    cutoff = time.time() - max_age
+    try:
+        names = os.listdir(SPOOL_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(SPOOL_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not prune spooled upload {name}: {e}")
+
+
+class _MappedFile(io.RawIOBase):
+    """Seekable read-only file object over an mmap, as ZipFile expects."""
+
+    def __init__(self, mapped):
+        self._mapped = mapped
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        return self._mapped.read(size)
+
+    def readinto(self, buffer):
+        data = self._mapped.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        try:
+            self._mapped.seek(offset, whence)
+        except ValueError as e:  # zipfile probes with seeks it expects to fail as OSError
+            raise OSError(str(e)) from e
+        return self._mapped.tell()
+
+    def tell(self):
+        return self._mapped.tell()
+
+
+def _map_archive(path):
+    """Open `path` read-only and memory-map it. Returns (file, mmap)."""
+    f = open(path, 'rb')
+    try:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise zp.BadZipFile("File is empty")
+        return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except BaseException:
+        f.close()
+        raise
+
+
+class DirectorySource:
+    """
+    An already extracted export folder, read through the part of the ZipFile API
+    the ingest uses (infolist/open). Files are not hashed: the modification time
+    stands in for the CRC32 in cache keys and thread fingerprints.
+    """
+
+    def __init__(self, root, deadline=None):
+        self.root = _find_export_root(os.path.abspath(root))
+        self.deadline = deadline
+
+    def infolist(self):
+        """List the files, stopping the walk as soon as MAX_ENTRIES or the deadline is passed."""
+        infos = []
+        for dir_path, dir_names, file_names in os.walk(self.root):
+            check_deadline(self.deadline, 'the export folder')
+            if MAX_ENTRIES and len(infos) + len(file_names) > MAX_ENTRIES:
+                raise ResourceLimitExceeded(
+                    f"The export folder contains more than the {MAX_ENTRIES:,} files this app accepts."
+                )
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                path = os.path.join(dir_path, file_name)
+                stat = os.stat(path)
+                info = zp.ZipInfo(os.path.relpath(path, self.root).replace(os.sep, '/'))
+                info.file_size = info.compress_size = stat.st_size
+                info.CRC = stat.st_mtime_ns & 0xFFFFFFFF
+                infos.append(info)
+        return infos
+
+    def open(self, name):
+        return open(os.path.join(self.root, *name.split('/')), 'rb')
+
+
+def _find_export_root(root):
+    """Step into the single top-level folder some unzip tools create around the export."""
+    markers = ('your_instagram_activity', 'connections')
+    while not any(os.path.isdir(os.path.join(root, marker)) for marker in markers):
+        children = [entry.path for entry in os.scandir(root) if entry.is_dir()]
+        if len(children) != 1:
+            break
+        root = children[0]
+    return root
+
+
+class ExportArchive:
+    """
+    Several export sources (ZIP parts and extracted folders) merged into one
+    namespace with the ZipFile-style infolist/open API. A path present in more
+    than one source is read from the first source that has it.
+    """
+
+    def __init__(self, sources):
+        self._sources = sources
+        self._infos = []
+        self._source_of = {}
+        for index, source in enumerate(sources):
+            for info in source.infolist():
+                if info.filename not in self._source_of:
+                    self._source_of[info.filename] = index
+                    self._infos.append(info)
+        if MAX_ENTRIES and len(self._infos) > MAX_ENTRIES:
+            raise ResourceLimitExceeded(
+                f"The export contains {len(self._infos):,} files, more than the {MAX_ENTRIES:,} this app accepts."
+            )
+
+    def infolist(self):
+        return self._infos
+
+    def open(self, name):
+        return self._sources[self._source_of[name]].open(name)
+
+
+class _CountingReader(io.RawIOBase):
+    """Binary reader that adds the bytes it returns to a shared counter (a multiprocessing.Value)."""
+
+    def __init__(self, f, counter):
+        self._f = f
+        self._counter = counter
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        with self._counter.get_lock():
+            self._counter.value += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+class _CountingArchive:
+    """View of an archive whose opened members count the uncompressed bytes read from them."""
+
+    def __init__(self, z, counter):
+        self._z = z
+        self._counter = counter
+
+    def infolist(self):
+        return self._z.infolist()
+
+    def open(self, name):
+        return _CountingReader(self._z.open(name), self._counter)
+
+
+def zip_entry_count(f):
+    """
+    Number of entries a ZIP declares in its end-of-central-directory record
+    (ZIP64 aware), read from the tail of the seekable binary file `f` without
+    loading the central directory. None when no record is found.
+    """
+    f.seek(0, io.SEEK_END)
+    size = f.tell()
+    f.seek(max(0, size - (22 + 0xFFFF)))  # record plus the longest archive comment
+    tail = f.read()
+    start = tail.rfind(b'PK\x05\x06')
+    if start < 0 or len(tail) - start < 22:
+        return None
+    entries = struct.unpack_from('<H', tail, start + 10)[0]
+    if entries == 0xFFFF and start >= 20 and tail[start - 20:start - 16] == b'PK\x06\x07':
+        f.seek(struct.unpack_from('<Q', tail, start - 12)[0])
+        record = f.read(40)
+        if len(record) == 40 and record[:4] == b'PK\x06\x06':
+            entries = struct.unpack_from('<Q', record, 32)[0]
+    return entries
+
+
+def _check_entry_count(f):
+    """Refuse an archive declaring more than MAX_ENTRIES entries before zipfile indexes them all."""
+    entries = zip_entry_count(f) if MAX_ENTRIES else None
+    f.seek(0)
+    if entries is not None and entries > MAX_ENTRIES:
+        raise ResourceLimitExceeded(
+            f"The archive lists {entries:,} files, more than the {MAX_ENTRIES:,} this app accepts."
+        )
+
+
+def _open_source(spec, stack, deadline=None):
+    """Open one export source: a ZIP path (memory mapped), a folder path or a ZIP file object."""
+    if not isinstance(spec, (str, os.PathLike)):
+        _check_entry_count(spec)
+        return stack.enter_context(zp.ZipFile(spec))
+    if os.path.isdir(spec):
+        return DirectorySource(spec, deadline)
+
+    if os.path.dirname(os.path.abspath(spec)) == os.path.abspath(SPOOL_DIR):
+        _touch(spec)  # mark a spooled upload as recently used; other files are left alone
+    f, mapped = _map_archive(spec)
+    stack.callback(f.close)
+    stack.callback(mapped.close)
+    archive = _MappedFile(mapped)
+    _check_entry_count(archive)
+    return stack.enter_context(zp.ZipFile(archive))
+
+
+def _touch(path):
+    """Mark a spooled upload or cache entry as recently used; failing that, it just ages out sooner."""
+    with suppress(OSError):
+        os.utime(path)
+
+
+def _source_specs(zip_files):
+    return list(zip_files) if isinstance(zip_files, (list, tuple)) else [zip_files]
+
+
+def _is_path_source(spec):
+    return isinstance(spec, (str, os.PathLike))
+
+
+@contextmanager
+def open_archive(zip_files, deadline=None):
+    """
+    Open an export as one ExportArchive. `zip_files` is a single source or a list
+    of them: ZIP paths are read through read-only memory maps (pages come from the
+    OS cache and are shared with the ingest workers), folders are read in place
+    (their walk stops at `deadline`) and file objects are used as they are.
+    Sources are opened concurrently.
+    """
+    specs = _source_specs(zip_files)
+    with ExitStack() as stack:
+        with ThreadPoolExecutor(max_workers=max(1, len(specs))) as pool:
+            sources = list(pool.map(lambda spec: _open_source(spec, stack, deadline), specs))
+        yield ExportArchive(sources)
+
+
+def classify_entry(name):
+    """Sort one archive path into (category, key, part) without touching its data."""
+    if name.endswith('/'):
+        return IGNORED, None, None
+
+    if name.startswith(INBOX_PATH_PREFIX):
+        folder, _, rest = name[len(INBOX_PATH_PREFIX):].partition('/')
+        match = MESSAGE_PART_RE.fullmatch(rest)
+        if folder and match:
+            return INBOX, folder, int(match.group(1))
+        return IGNORED, folder or None, None
+
+    base_name = name.rsplit('/', 1)[-1]
+    if name.startswith(STORY_PATH) and base_name in STORY_FILES:
+        return STORY, STORY_FILES[base_name], None
+    if name.startswith(CONNECTIONS_PATH) and base_name in CONNECTION_FILES:
+        return CONNECTION, CONNECTION_FILES[base_name], None
+    return IGNORED, None, None
+
+
+def build_manifest(z, deadline=None):
+    """
+    Index an open archive in a single pass over its central directory, stopping
+    with ResourceLimitExceeded past `deadline`.
+    Returns a dict with every entry grouped by category, inbox thread parts grouped
+    by folder (sorted by part number), the story/connection members by section name,
+    per-category (compressed, uncompressed) byte totals and the deactivated folders.
+    """
+    manifest = {
+        'file_count': 0,
+        'entries': {category: [] for category in CATEGORIES},
+        'threads': {},
+        'sections': {},
+        'sizes': {category: [0, 0] for category in CATEGORIES},
+        'deactivated_accounts': set(),
+    }
+
+    for info in z.infolist():
+        manifest['file_count'] += 1
+        if not manifest['file_count'] % 4096:
+            check_deadline(deadline, 'the export index')
+        category, key, part = classify_entry(info.filename)
+        entry = ManifestEntry(
+            info.filename, category, key, part, info.compress_size, info.file_size, info.CRC
+        )
+        manifest['entries'][category].append(entry)
+        manifest['sizes'][category][0] += info.compress_size
+        manifest['sizes'][category][1] += info.file_size
+
+        if category == INBOX:
+            manifest['threads'].setdefault(key, []).append(entry)
+        elif category in (STORY, CONNECTION):
+            manifest['sections'].setdefault(key, entry)
+
+        if key and key.startswith('instagramuser_'):
+            manifest['deactivated_accounts'].add(key)
+
+    for parts in manifest['threads'].values():
+        parts.sort(key=lambda entry: entry.part)
+
+    return manifest
+
+
+def estimate_work(manifest):
+    """Size up an export from its manifest alone: thread count and uncompressed bytes per section."""
+    inbox_bytes = sum(entry.file_size for entry in manifest['entries'][INBOX])
+    story_bytes = sum(entry.file_size for entry in manifest['entries'][STORY])
+    connection_bytes = sum(entry.file_size for entry in manifest['entries'][CONNECTION])
+    largest_member = max(
+        (entry.file_size for category in (INBOX, STORY, CONNECTION) for entry in manifest['entries'][category]),
+        default=0,
+    )
+    return WorkEstimate(
+        len(manifest['threads']), inbox_bytes, story_bytes, connection_bytes,
+        inbox_bytes + story_bytes + connection_bytes, largest_member,
+    )
+
+
+def format_bytes(size):
+    """Human readable byte count, e.g. 1.5 GB."""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:,.0f} {unit}" if unit == 'B' else f"{size:,.1f} {unit}"
+        size /= 1024
+
+
+def check_member_size(size):
+    """Raise ResourceLimitExceeded for a member of `size` uncompressed bytes above MAX_MEMBER_BYTES."""
+    if MAX_MEMBER_BYTES and size > MAX_MEMBER_BYTES:
+        raise ResourceLimitExceeded(
+            f"One file in this export is {format_bytes(size)} uncompressed, more than the "
+            f"{format_bytes(MAX_MEMBER_BYTES)} allowed per file."
+        )
+
+
+def check_work(work):
+    """
+    Apply the pre-flight limits to a WorkEstimate. Returns notices as (level, text)
+    (a warning above WORK_WARN_BYTES); raises WorkLimitExceeded above WORK_MAX_BYTES
+    and ResourceLimitExceeded for a member larger than MAX_MEMBER_BYTES. Declared
+    sizes are binding: zipfile never returns more than a member's declared size.
+    """
+    check_member_size(work.largest_member)
+    if WORK_MAX_BYTES and work.total_bytes > WORK_MAX_BYTES:
+        raise WorkLimitExceeded(
+            f"This export has {format_bytes(work.total_bytes)} of messages and activity to analyze, more than the "
+            f"{format_bytes(WORK_MAX_BYTES)} this app accepts. Request a shorter date range from Instagram."
+        )
+    if WORK_WARN_BYTES and work.total_bytes > WORK_WARN_BYTES:
+        return [('warning', f"⚠️ Large export: {format_bytes(work.total_bytes)} in {work.threads:,} conversations "
+                            "to analyze. This may take a while.")]
+    return []
+
+
+def preflight(zip_files):
+    """
+    Read only the central directory of an export and size up the work.
+    Returns (WorkEstimate, notices); raises WorkLimitExceeded like load_export.
+    """
+    deadline = stage_deadline()
+    with open_archive(zip_files, deadline) as z:
+        work = estimate_work(build_manifest(z, deadline))
+    return work, check_work(work)
+
+
+def _orjson_loads(data):
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        # orjson rejects NaN/Infinity and integers beyond 64 bits, which the stdlib accepts
+        return json.loads(data)
+
+
+def set_json_backend(name='auto'):
+    """
+    Select the JSON decoder used by every loader: 'orjson', 'json' (stdlib) or
+    'auto' for orjson when it is installed. Falls back to the stdlib with a
+    warning when orjson is requested but missing. Returns the active backend name.
+    """
+    global _json_backend, _json_loads
+    if name == 'auto':
+        name = 'json' if orjson is None else 'orjson'
+    if name == 'orjson' and orjson is None:
+        logger.warning("orjson is not installed; using the stdlib JSON decoder")
+        name = 'json'
+    if name not in ('orjson', 'json'):
+        raise ValueError(f"Unknown JSON backend: {name}")
+    _json_backend = name
+    _json_loads = _orjson_loads if name == 'orjson' else json.loads
+    return name
+
+
+def decode_json(data):
+    """
+    Decode one JSON document from raw UTF-8 bytes with the active backend.
+    Raises json.JSONDecodeError (orjson's error is a subclass) on malformed input.
+    """
+    return _json_loads(data)
+
+
+def read_json(f):
+    """Read a binary file object (e.g. from ZipFile.open) to the end and decode it."""
+    return decode_json(f.read())
+
+
+set_json_backend(JSON_BACKEND)
+
+
+class _JsonStream:
+    """
+    Pull-style reader over a binary JSON stream. Values are decoded one at a time
+    with the stdlib scanner, so only the current value and a read-ahead buffer are
+    ever held in memory.
+    """
+
+    def __init__(self, f, chunk_size=STREAM_CHUNK_SIZE):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._scanner = json.JSONDecoder().raw_decode
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Append more decoded text to the buffer; the read size grows with the pending value."""
+        if self._eof:
+            return False
+        pending = len(self._buf) - self._pos
+        data = self._f.read(max(self._chunk_size, pending))
+        self._buf = self._buf[self._pos:] + self._decoder.decode(data, final=not data)
+        self._pos = 0
+        if not data:
+            self._eof = True
+        return True
+
+    def _error(self, message):
+        return json.JSONDecodeError(message, self._buf, self._pos)
+
+    def next_char(self):
+        """Skip whitespace and return the next structural character ('' at end of input)."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in ' \t\n\r':
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        """Consume one of `chars` as the next structural character and return it."""
+        char = self.next_char()
+        if not char or char not in chars:
+            raise self._error(f"Expecting one of {chars!r}")
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Decode and consume the next complete JSON value."""
+        self.next_char()
+        while True:
+            try:
+                value, end = self._scanner(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number or literal running into the end of the buffer may be cut short
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def iter_array(self):
+        """Yield the elements of the array at the current position one by one."""
+        self.expect('[')
+        if self.next_char() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+
+def stage_deadline():
+    """time.time() deadline of an ingest stage starting now, None without a STAGE_TIME_BUDGET."""
+    return time.time() + STAGE_TIME_BUDGET if STAGE_TIME_BUDGET else None
+
+
+def check_deadline(deadline, stage):
+    """Raise ResourceLimitExceeded once the time.time() `deadline` of an ingest stage has passed."""
+    if deadline is not None and time.time() > deadline:
+        raise ResourceLimitExceeded(
+            f"Processing {stage} took longer than the time allowed and was stopped."
+        )
+
+
+def _check_message_count(count):
+    if MAX_MESSAGES_PER_THREAD and count > MAX_MESSAGES_PER_THREAD:
+        raise ResourceLimitExceeded(
+            f"A conversation has more than the {MAX_MESSAGES_PER_THREAD:,} messages allowed per conversation."
+        )
+
+
+def _guard_messages(messages, deadline):
+    """Pass messages through, aborting past MAX_MESSAGES_PER_THREAD or the stage deadline."""
+    for count, msg in enumerate(messages, 1):
+        if not count & 0xFFF:
+            _check_message_count(count)
+            check_deadline(deadline, 'your messages')
+        yield msg
+
+
+def stream_thread(f, chunk_size=STREAM_CHUNK_SIZE, date_range=None, deadline=None):
+    """
+    Stream one message_N.json document and keep only what the metrics need.
+    The `messages` array is consumed element by element and projected to
+    (sender_name, timestamp_ms, type code) tuples, dropping messages outside `date_range`
+    (see project_messages) as they are read; every other member except
+    `participants` is decoded and dropped. Reading aborts with
+    ResourceLimitExceeded past MAX_MESSAGES_PER_THREAD messages or `deadline`.
+    Returns a dict with 'participants' and 'messages' (the projected tuples).
+    Raises json.JSONDecodeError on malformed input and ValueError if the document
+    is not a thread object.
+    """
+    stream = _JsonStream(f, chunk_size)
+    thread = {}
+
+    if stream.next_char() != '{':
+        raise ValueError("top-level JSON value is not an object")
+    stream.expect('{')
+    if stream.next_char() == '}':
+        raise ValueError("thread has no messages")
+
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        if key == 'messages' and stream.next_char() == '[':
+            thread['messages'] = project_messages(_guard_messages(stream.iter_array(), deadline), date_range)
+        elif key == 'participants':
+            thread['participants'] = stream.value()
+        else:
+            stream.value()
+        if stream.expect(',}') == '}':
+            break
+
+    if 'messages' not in thread:
+        raise ValueError("thread has no messages")
+    thread.setdefault('participants', [])
+    return thread
+
+
+def parse_thread(data, date_range=None):
+    """
+    Decode a whole message_N.json document from bytes and project and window it
+    like stream_thread, with the same result and errors.
+    """
+    document = decode_json(data)
+    if not isinstance(document, dict):
+        raise ValueError("top-level JSON value is not an object")
+    messages = document.get('messages')
+    if not isinstance(messages, list):
+        raise ValueError("thread has no messages")
+    _check_message_count(len(messages))
+    return {
+        'participants': document.get('participants', []),
+        'messages': project_messages(messages, date_range),
+    }
+
+
+def load_thread(z, parts, date_range=None, deadline=None):
+    """
+    Read every message_N.json part of one inbox thread and merge them.
+    Each part is projected to (sender_name, timestamp_ms, type code) tuples, appended to the
+    first valid part and sorted oldest first. Parts up to WHOLE_DOCUMENT_MAX_BYTES
+    are decoded whole with the active JSON backend; larger ones parse straight
+    from the archive stream. Messages outside `date_range` are dropped while each
+    part is read.
+    Returns (thread, notices); thread is None when no part could be read.
+    Raises ResourceLimitExceeded when a guardrail trips (see stream_thread).
+    """
+    thread = None
+    notices = []
+
+    for entry in parts:
+        try:
+            with z.open(entry.name) as f:
+                if 0 < entry.file_size <= WHOLE_DOCUMENT_MAX_BYTES:
+                    data = parse_thread(f.read(), date_range)
+                else:
+                    data = stream_thread(f, date_range=date_range, deadline=deadline)
+        except ResourceLimitExceeded:
+            raise
+        except json.JSONDecodeError as e:
+            notices.append(('warning', f"Invalid JSON in {entry.name}: {e}"))
+            continue
+        except ValueError as e:
+            logger.warning(f"Invalid JSON structure in {entry.name}: {e}")
+            continue
+        except Exception as e:
+            notices.append(('warning', f"Error reading {entry.name}: {e}"))
+            continue
+
+        if not isinstance(data['participants'], list):
+            notices.append(('warning', f"Skipped {entry.name}: its participants are not a list"))
+            continue
+
+        if thread is None:
+            thread = data
+        else:
+            thread['messages'].extend(data['messages'])
+            if not thread['participants'] and data['participants']:
+                thread['participants'] = data['participants']
+        _check_message_count(len(thread['messages']))
+        check_deadline(deadline, 'your messages')
+
+    if thread is not None:
+        try:
+            thread['messages'].sort(key=lambda x: x[1] if x[1] is not None else 0)
+        except TypeError as e:
+            logger.warning(f"Error sorting messages of {parts[0].key}: {e}")
+
+    return thread, notices
+
+
+def summarize_thread(z, parts, date_range=None, deadline=None):
+    """
+    Load one inbox thread and reduce it to a ThreadResult (participant names and
+    compact sender/timestamp/type columns) over the messages in `date_range` only.
+    Returns (result, notices); result is None when the thread could not be read.
+    """
+    thread, notices = load_thread(z, parts, date_range, deadline)
+    if thread is None:
+        return None, notices
+
+    # Names are text in the tables (and the Parquet cache) whatever type the export used
+    names = [p.get('name') if isinstance(p, dict) else None for p in thread['participants']]
+    participants = ['Unknown' if name is None else name if isinstance(name, str) else str(name) for name in names]
+    result = ThreadResult(parts[0].key, participants, *encode_messages(thread['messages']))
+    return result, notices
+
+
+def encode_messages(messages):
+    """
+    Pack projected (sender_name, timestamp_ms, type code) messages into compact
+    columns. Returns (sender_names, sender_codes, timestamps, type_codes) where
+    sender_codes index sender_names, which are always strings; missing senders
+    and timestamps that are missing or not an int in [0, 2**63) (booleans
+    included) are stored as MISSING.
+    """
+    sender_index = {}
+    try:
+        sender_codes = array('i', [
+            MISSING if sender is None else sender_index.setdefault(sender, len(sender_index)) for sender, _, _ in messages
+        ])
+    except TypeError:
+        # A malformed export may use lists or objects as sender names; index those by their text
+        sender_index = {}
+        sender_codes = array('i', [
+            MISSING if sender is None else sender_index.setdefault(str(sender), len(sender_index))
+            for sender, _, _ in messages
+        ])
+    timestamps = array('q', [
+        timestamp if type(timestamp) is int and 0 <= timestamp < 1 << 63 else MISSING for _, timestamp, _ in messages
+    ])
+    type_codes = array('b', [type_code for _, _, type_code in messages])
+    sender_names = [name if isinstance(name, str) else str(name) for name in sender_index]
+    return sender_names, sender_codes, timestamps, type_codes
+
+
+def _init_worker(source_paths, json_backend, bytes_read=None):
+    """Process-pool initializer: open the export sources once for the lifetime of the worker."""
+    global _worker_zip, _worker_stack
+    set_json_backend(json_backend)
+    _worker_stack = ExitStack()
+    _worker_zip = ExportArchive([_open_source(path, _worker_stack) for path in source_paths])
+    if bytes_read is not None:
+        _worker_zip = _CountingArchive(_worker_zip, bytes_read)
+
+
+def _summarize_in_worker(parts, date_range, deadline):
+    return summarize_thread(_worker_zip, parts, date_range, deadline)
+
+
+def summarize_threads(zip_files, z, thread_parts, workers=None, date_range=None, bytes_read=None, deadline=None):
+    """
+    Summarize every inbox thread over the messages in `date_range`, yielding
+    (index, result, notices) as threads finish. Uncompressed bytes read are
+    added to `bytes_read` (a multiprocessing.Value) as parsing goes, if given.
+    Every thread, including those running in workers, stops at the time.time()
+    `deadline` with ResourceLimitExceeded, and pending threads are dropped.
+    With several workers, sources given as filesystem paths and a large enough inbox,
+    threads fan out to a process pool whose workers open the sources by path;
+    otherwise they run in-process on the already open archive `z` (threads, or
+    serially with one worker).
+    """
+    workers = INGEST_WORKERS if workers is None else workers
+    specs = _source_specs(zip_files)
+    if bytes_read is not None:
+        z = _CountingArchive(z, bytes_read)
+    inbox_bytes = sum(entry.file_size for parts in thread_parts for entry in parts)
+    use_processes = (
+        workers > 1
+        and all(_is_path_source(spec) for spec in specs)
+        and inbox_bytes >= PROCESS_POOL_MIN_BYTES
+    )
+
+    if workers <= 1:
+        for index, parts in enumerate(thread_parts):
+            yield (index,) + summarize_thread(z, parts, date_range, deadline)
+        return
+
+    if use_processes:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=([os.fspath(spec) for spec in specs], _json_backend, bytes_read),
+        )
+        task, args = _summarize_in_worker, ()
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        task, args = summarize_thread, (z,)
+
+    with pool:
+        futures = {
+            pool.submit(task, *args, parts, date_range, deadline): index for index, parts in enumerate(thread_parts)
+        }
+        try:
+            for future in as_completed(futures):
+                yield (futures[future],) + future.result()
+        finally:
+            # When the caller stops early (e.g. a cancelled ingest), drop the threads not yet started
+            for future in futures:
+                future.cancel()
+
+
+def build_tables(thread_results):
+    """
+    Lay out the compact columns of every thread as the export's message table
+    (see ig_metrics) and its side tables, with names as exported:
+    messages_df  thread_id, sender_id, timestamp_ms, type; one row per message,
+                 grouped by thread in thread_results order
+    threads_df   folder and participants (list of names) per thread_id
+    senders_df   sender_name per sender_id, senders interned across threads
+    Returns (messages_df, threads_df, senders_df).
+    """
+    sender_ids = {}
+    sender_codes, timestamps, type_codes = [], [], []
+
+    for result in thread_results:
+        local_to_global = np.array(
+            [sender_ids.setdefault(name, len(sender_ids)) for name in result.sender_names] + [MISSING],
+            dtype=np.int32,
+        )
+        sender_codes.append(local_to_global[np.asarray(result.sender_codes, dtype=np.int32)])  # MISSING stays MISSING
+        timestamps.append(np.asarray(result.timestamps, dtype=np.int64))
+        type_codes.append(np.asarray(result.type_codes, dtype=np.int8))
+
+    counts = [len(codes) for codes in sender_codes]
+    messages_df = pd.DataFrame({
+        'thread_id': np.repeat(np.arange(len(thread_results), dtype=np.int32), counts),
+        'sender_id': np.concatenate(sender_codes) if sender_codes else np.empty(0, np.int32),
+        'timestamp_ms': np.concatenate(timestamps) if timestamps else np.empty(0, np.int64),
+        'type': np.concatenate(type_codes) if type_codes else np.empty(0, np.int8),
+    })
+    threads_df = pd.DataFrame({
+        'folder': [result.folder for result in thread_results],
+        'participants': [list(result.participants) for result in thread_results],
+    })
+    senders_df = pd.DataFrame({'sender_name': list(sender_ids)}, dtype=object)
+    return messages_df, threads_df, senders_df
+
+
+def repair_names(threads_df, senders_df):
+    """
+    Repaired copies of the side tables for display: threads_df gains `name`, the
+    thread's first participant, and senders_df's `sender_name` is repaired.
+    IDs are unchanged, so two senders may repair to the same name.
+    """
+    threads_df = threads_df.assign(name=repair_mojibake(
+        [participants[0] if len(participants) else None for participants in threads_df['participants']],
+        'participant names',
+    ))
+    senders_df = senders_df.assign(sender_name=repair_mojibake(senders_df['sender_name'].tolist(), 'sender names'))
+    return threads_df, senders_df
+
+
+def friend_handle(folder, participants):
+    """
+    The friend a thread is with, identified by the username of its inbox folder,
+    or None for group chats and deactivated ("Instagram User") or unnamed participants.
+    """
+    if len(participants) > 2 or not len(participants) or participants[0] in ('Instagram User', 'Unknown'):
+        return None
+    match = FOLDER_HANDLE_RE.match(folder)
+    return match.group(1) if match else folder
+
+
+def label_friends(names, handles):
+    """Friends' display names: their repaired names, with the username appended where different friends share a name."""
+    shared = pd.Series(names, dtype=object).duplicated(keep=False).to_numpy()
+    return [f"{name} ({handle})" if clash else name for name, handle, clash in zip(names, handles, shared)]
+
+
+def select_friends(threads_df):
+    """
+    Register the friends of the repaired threads table: the other participant of
+    each one-on-one thread (see friend_handle). Friends are kept in a dict keyed by
+    handle so registering is linear in the thread count; later threads of a
+    registered friend join that friend. Names come from label_friends.
+    Returns (friend_of_thread, friend_names, group_count): the friend (index into
+    friend_names) of each thread, MISSING if none, and the friends' names in
+    order of their first thread.
+    """
+    registry = {}
+    names = []
+    friend_of_thread = np.full(len(threads_df), MISSING, dtype=np.int64)
+    groups = 0
+
+    for thread_id, (folder, participants, safe_name) in enumerate(
+        zip(threads_df['folder'], threads_df['participants'], threads_df['name'])
+    ):
+        try:
+            # Skip group chats, Instagram User and empty participants
+            handle = friend_handle(folder, participants)
+            if handle is None:
+                groups += len(participants) > 2
+                continue
+
+            if handle not in registry:
+                registry[handle] = len(names)
+                names.append(safe_name)
+            friend_of_thread[thread_id] = registry[handle]
+
+        except Exception as e:
+            logger.warning(f"Error processing message conversation: {e}")
+            continue
+
+    return friend_of_thread, pd.Index(label_friends(names, list(registry)), dtype=object), groups
+
+
+def build_inbox_df(friend_names, metrics, sketch_df, notices):
+    """
+    Score the friends (see select_friends) into the per-friend table from their
+    friend_metrics; reply-time percentiles from the friends' sketches sit next
+    to avg_reply_time.
+    Returns (inbox_df, reply_sketch_df) where reply_sketch_df holds the friends'
+    reply-time sketches keyed by name (see ig_metrics.build_sketches).
+    """
+    # Friends' sketches, keyed by name instead of friend index
+    reply_sketch_df = sketch_df.assign(key=friend_names.to_numpy()[sketch_df['key'].to_numpy()])
+
+    # Create DataFrame with error handling
+    try:
+        percentiles = sketch_quantiles(reply_sketch_df).reindex(friend_names).reset_index(drop=True)
+        inbox_df = pd.DataFrame({
+            'names': friend_names.to_numpy(),
+            'msgs_count': metrics['msgs_count'],
+            'avg_reply_time': metrics['avg_reply_time'],
+            **{column: percentiles[column] for column in percentiles.columns},
+            'longest_reply_time': metrics['longest_reply_time'],
+            'fastest_reply_time': metrics['fastest_reply_time'],
+        })
+        if not inbox_df.empty:
+            inbox_df = inbox_df[inbox_df['avg_reply_time'] != 0]
+            inbox_df = inbox_df.sort_values(by='msgs_count', ascending=False).reset_index(drop=True)
+        else:
+            notices.append(('warning', "⚠️ No valid conversation data found."))
+    except Exception as e:
+        notices.append(('error', f"❌ Error creating inbox DataFrame: {e}"))
+        inbox_df = pd.DataFrame()
+
+    return inbox_df, reply_sketch_df
+
+
+def score_inbox(messages_df, threads_df, senders_df, notices):
+    """
+    Compute everything the views read from the message table; threads_df and
+    senders_df must have repaired names. Returns a dict of export fields:
+    threads_df (gaining each thread's `friend`), inbox_df, groups, reply_sketch_df,
+    sessions_df, cube_df, activity_df, all_activity_df, rank_df and group_replies_df.
+    """
+    friend_of_thread, friend_names, groups = select_friends(threads_df)
+    metrics, sketch_df = friend_metrics(messages_df, friend_of_thread, len(friend_names))
+    inbox_df, reply_sketch_df = build_inbox_df(friend_names, metrics, sketch_df, notices)
+
+    # A message is received when its sender's repaired name is the thread's participant name
+    names, _ = pd.factorize(np.concatenate([senders_df['sender_name'].to_numpy(), threads_df['name'].to_numpy()]))
+    sender_ids = messages_df['sender_id'].to_numpy()
+    received = (sender_ids != MISSING) & (
+        np.append(names[:len(senders_df)], MISSING)[sender_ids] == names[len(senders_df):][messages_df['thread_id'].to_numpy()]
+    )
+    friend_activity, all_activity = activity_heatmaps(messages_df, friend_of_thread, len(friend_names), TIMEZONE)
+    grouped = np.fromiter((len(participants) > 2 for participants in threads_df['participants']), bool, len(threads_df))
+
+    return {
+        'threads_df': threads_df.assign(friend=np.append(friend_names.to_numpy(), None)[friend_of_thread]),
+        'inbox_df': inbox_df,
+        'groups': groups,
+        'reply_sketch_df': reply_sketch_df,
+        'sessions_df': build_sessions_df(messages_df, SESSION_GAP_SECONDS),
+        'cube_df': build_rollup_cube(messages_df, friend_of_thread, received, friend_names, TIMEZONE),
+        'activity_df': pd.DataFrame(
+            friend_activity, index=friend_names.rename('friend'), columns=list(HOUR_OF_WEEK_LABELS)
+        ),
+        'all_activity_df': pd.DataFrame([all_activity], columns=list(HOUR_OF_WEEK_LABELS)),
+        'rank_df': build_rank_index(inbox_df),
+        'group_replies_df': group_reply_matrix(messages_df, grouped),
+    }
+
+
+def group_chat_labels(threads_df, thread_ids, max_members=3):
+    """
+    Display labels of the group chats in thread_ids: the repaired names of their
+    first `max_members` members and how many more there are, numbered when two
+    chats have the same label.
+    """
+    members = threads_df['participants'].reindex(thread_ids).tolist()
+    names = iter(repair_mojibake([name for names in members for name in names], 'group members'))
+    labels = []
+    counts = {}
+    for group in members:
+        group_names = [next(names) for _ in group]
+        label = ', '.join(group_names[:max_members])
+        if len(group_names) > max_members:
+            label += f" +{len(group_names) - max_members}"
+        counts[label] = counts.get(label, 0) + 1
+        labels.append(label if counts[label] == 1 else f"{label} ({counts[label]})")
+    return labels
+
+
+def group_chat_stats(group_replies_df, senders_df, thread_ids=None):
+    """
+    Member responsiveness and pairwise affinity of the group chats in thread_ids,
+    or of all of them (see ig_metrics.member_responsiveness and pair_affinity),
+    with sender ids replaced by their repaired names.
+    Returns (members_df, pairs_df): members_df with a `member` column, most
+    replies first, and pairs_df with `member_a` and `member_b` columns.
+    """
+    if thread_ids is not None:
+        group_replies_df = group_replies_df[group_replies_df['thread_id'].isin(thread_ids)]
+    names = senders_df['sender_name']
+
+    members_df = member_responsiveness(group_replies_df)
+    members_df = members_df.sort_values('replies_sent', ascending=False, kind='stable')
+    members_df.insert(0, 'member', names.reindex(members_df.index).to_numpy())
+
+    pairs_df = pair_affinity(group_replies_df)
+    pairs_df.insert(0, 'member_a', names.reindex(pairs_df.pop('member_a_id')).to_numpy())
+    pairs_df.insert(1, 'member_b', names.reindex(pairs_df.pop('member_b_id')).to_numpy())
+    return members_df.reset_index(drop=True), pairs_df
+
+
+def load_story_df(z, manifest, notices, deadline=None):
+    """
+    Count story likes per account from story_likes.json. Returns a DataFrame
+    (empty if absent); raises ResourceLimitExceeded past `deadline` or for a file
+    above MAX_MEMBER_BYTES.
+    """
+    story_likes = None
+    story_entry = manifest['sections'].get('story_likes')
+
+    if story_entry is not None:
+        check_member_size(story_entry.file_size)
+        try:
+            with z.open(story_entry.name) as f:
+                story_likes = read_json(f)
+        except json.JSONDecodeError as e:
+            notices.append(('warning', f"Invalid JSON in story likes file: {e}"))
+        except Exception as e:
+            logger.warning(f"Error reading story likes file: {e}")
+        check_deadline(deadline, 'your story likes')
+
+    user_by_story = {}
+    story_df = pd.DataFrame()
+
+    try:
+        if story_likes and 'story_activities_story_likes' in story_likes:
+            titles = []
+            for user in story_likes['story_activities_story_likes']:
+                try:
+                    title = user.get('title', 'Unknown')
+                    if title != 'Unknown':
+                        titles.append(title)
+                except Exception as e:
+                    logger.warning(f"Error processing story like entry: {e}")
+                    continue
+
+            for title in repair_mojibake(titles, 'story titles'):
+                user_by_story[title] = user_by_story.get(title, 0) + 1
+
+            if user_by_story:
+                story_df = pd.Series(user_by_story).reset_index().rename(columns={'index': 'User_Name', 0: 'Story_Likes'})
+                story_df.sort_values(by='Story_Likes', ascending=False, inplace=True)
+                story_df.reset_index(inplace=True, drop=True)
+    except Exception as e:
+        logger.warning(f"Error processing story data: {e}")
+
+    return story_df
+
+
+def load_connections_df(z, manifest, notices, deadline=None):
+    """
+    Flatten the followers, following and close friends files into one table with
+    one row per entry: relation, username, href and timestamp. Raises
+    ResourceLimitExceeded past `deadline` or for a file above MAX_MEMBER_BYTES.
+    """
+    rows = []
+    labels = {'followers': "followers file", 'following': "following file", 'close_friends': "close friends file"}
+
+    for section, list_key in CONNECTION_LIST_KEYS.items():
+        entry = manifest['sections'].get(section)
+        if entry is None:
+            continue
+        check_member_size(entry.file_size)
+        try:
+            with z.open(entry.name) as f:
+                data = read_json(f)
+        except json.JSONDecodeError as e:
+            notices.append(('warning', f"Invalid JSON in {labels[section]}: {e}"))
+            continue
+        except Exception as e:
+            logger.warning(f"Error processing connection file {entry.name}: {e}")
+            continue
+        check_deadline(deadline, 'your followers and following')
+
+        if list_key is None:
+            items = data if isinstance(data, list) else []
+        else:
+            items = data.get(list_key, []) if isinstance(data, dict) else []
+
+        for item in items:
+            item = item if isinstance(item, dict) else {}
+            string_data = item.get('string_list_data') or [{}]
+            string_data = string_data[0] if isinstance(string_data[0], dict) else {}
+            rows.append((
+                section,
+                item.get('title') or string_data.get('value') or '',
+                string_data.get('href', ''),
+                string_data.get('timestamp', 0),
+            ))
+
+    connections_df = pd.DataFrame(rows, columns=['relation', 'username', 'href', 'timestamp'])
+    connections_df['username'] = repair_mojibake(connections_df['username'].tolist(), 'connection usernames')
+    return connections_df
+
+
+# Non-inbox sections, decoded only when a view asks for them (see load_section)
+SECTION_LOADERS = {'story': load_story_df, 'connections': load_connections_df}
+
+
+def load_section(zip_files, section, use_cache=True, date_range=None):
+    """
+    Decode one non-inbox section ('story' or 'connections') of an export on demand.
+    Only the central directory and that section's files are read; the result is
+    added to the disk cache entry of the export loaded with the same `date_range`,
+    if there is one, so it is decoded at most once per export.
+    Returns (DataFrame, notices) with notices as (level, text).
+    """
+    loader = SECTION_LOADERS[section]
+    date_range = normalize_date_range(date_range)
+    notices = []
+    deadline = stage_deadline()
+    with open_archive(zip_files, deadline) as z:
+        manifest = build_manifest(z, deadline)
+        cache_key = manifest_cache_key(manifest, date_range) if use_cache and CACHE_MAX_BYTES > 0 else None
+        if cache_key:
+            cached = _load_cached_section(cache_key, section)
+            if cached is not None:
+                return cached
+        df = loader(z, manifest, notices, deadline)
+
+    if cache_key:
+        _store_cached_section(cache_key, section, df, notices)
+    return df, notices
+
+
+def manifest_cache_key(manifest, date_range=None):
+    """
+    Content address of an export: a hash of its central directory (names, CRCs
+    and sizes), of the date window the inbox was parsed with and of the session
+    gap and time zone the views are computed with.
+    """
+    digest = hashlib.sha256(
+        f"ig-export-cache-v{CACHE_VERSION}\0{date_range}\0{SESSION_GAP_SECONDS}\0{TIMEZONE}".encode()
+    )
+    for category in CATEGORIES:
+        for entry in manifest['entries'][category]:
+            digest.update(f"{entry.name}\0{entry.crc}\0{entry.file_size}\0{entry.compress_size}\n".encode('utf-8', 'replace'))
+    return digest.hexdigest()
+
+
+def load_cached_export(cache_key):
+    """Read a parsed export from the disk cache and mark it recently used. Returns None on a miss."""
+    path = os.path.join(CACHE_DIR, cache_key)
+    if not os.path.isdir(path):
+        return None
+    try:
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            export = json.load(f)
+        export['notices'] = [tuple(notice) for notice in export['notices']]
+        for export_key, table in CACHE_TABLES.items():
+            export[export_key] = pd.read_parquet(os.path.join(path, f"{table}.parquet"))
+        export['threads_df'] = read_threads_parquet(os.path.join(path, 'threads.parquet'))
+        _touch(path)
+        return export
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable cache entry {cache_key}: {e}")
+        shutil.rmtree(path, ignore_errors=True)
+        return None
+
+
+def read_threads_parquet(path):
+    """Read a stored threads table; participants come back from Parquet as arrays and are restored to lists."""
+    threads_df = pd.read_parquet(path)
+    threads_df['participants'] = [list(participants) for participants in threads_df['participants']]
+    return threads_df
+
+
+def store_cached_export(cache_key, export):
+    """Write a parsed export to the disk cache as zstd-compressed Parquet, then enforce the budget."""
+    if not _ensure_dir(CACHE_DIR):
+        return
+    path = os.path.join(CACHE_DIR, cache_key)
+    staging = tempfile.mkdtemp(dir=CACHE_DIR, prefix=f".{cache_key[:12]}-")
+    try:
+        for export_key, table in CACHE_TABLES.items():
+            export[export_key].to_parquet(os.path.join(staging, f"{table}.parquet"), compression='zstd')
+        with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({field: export[field] for field in CACHE_FIELDS}, f)
+        os.replace(staging, path)
+    except Exception as e:
+        logger.warning(f"Could not write cache entry {cache_key}: {e}")
+        shutil.rmtree(staging, ignore_errors=True)
+        return
+    evict_cache()
+
+
+def _load_cached_section(cache_key, section):
+    path = os.path.join(CACHE_DIR, cache_key)
+    try:
+        with open(os.path.join(path, f"{section}.notices.json"), encoding='utf-8') as f:
+            notices = [tuple(notice) for notice in json.load(f)]
+        return pd.read_parquet(os.path.join(path, f"{section}.parquet")), notices
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable cached {section} section of {cache_key}: {e}")
+        return None
+
+
+def _store_cached_section(cache_key, section, df, notices):
+    """Add a decoded section to an existing cache entry; the notices file is written last and marks it complete."""
+    path = os.path.join(CACHE_DIR, cache_key)
+    if not os.path.isfile(os.path.join(path, 'meta.json')):
+        return
+    try:
+        staging = os.path.join(path, f".{section}.parquet")
+        df.to_parquet(staging, compression='zstd')
+        os.replace(staging, os.path.join(path, f"{section}.parquet"))
+        staging = os.path.join(path, f".{section}.notices.json")
+        with open(staging, 'w', encoding='utf-8') as f:
+            json.dump(notices, f)
+        os.replace(staging, os.path.join(path, f"{section}.notices.json"))
+    except Exception as e:
+        logger.warning(f"Could not cache {section} section of {cache_key}: {e}")
+
+
+def _ensure_dir(path):
+    try:
+        os.makedirs(path, exist_ok=True)
+        return True
+    except OSError as e:
+        logger.warning(f"Disk cache disabled, cannot create {path}: {e}")
+        return False
+
+
+def evict_cache(max_bytes=None):
+    """Delete least recently used cache entries until the cache fits in `max_bytes`."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    try:
+        for name in os.listdir(CACHE_DIR):
+            path = os.path.join(CACHE_DIR, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, path))
+    except OSError as e:
+        logger.warning(f"Could not scan cache directory: {e}")
+        return
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def thread_signature(parts, date_range=None):
+    """Fingerprint of one thread's parts (names, CRC32s and sizes) and date window, to detect unchanged threads."""
+    digest = hashlib.sha256(f"{date_range}\n".encode())
+    for entry in parts:
+        digest.update(f"{entry.name}\0{entry.crc}\0{entry.file_size}\n".encode('utf-8', 'replace'))
+    return digest.hexdigest()
+
+
+def _user_store_path(username):
+    return os.path.join(CACHE_DIR, f"user-{username}-v{CACHE_VERSION}")
+
+
+def load_user_threads(username):
+    """
+    Read the per-thread results saved for the last export of `username`.
+    Returns {folder: (signature, ThreadResult)}, empty when nothing is stored.
+    """
+    path = _user_store_path(username)
+    if not username or not os.path.isdir(path):
+        return {}
+    try:
+        threads_df = read_threads_parquet(os.path.join(path, 'threads.parquet'))
+        messages_df = pd.read_parquet(os.path.join(path, 'messages.parquet'))
+        sender_names = pd.read_parquet(os.path.join(path, 'senders.parquet'))['sender_name'].to_numpy(dtype=object)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable thread store for {username}: {e}")
+        shutil.rmtree(path, ignore_errors=True)
+        return {}
+
+    # Split the stored message table back into per-thread columns
+    bounds = thread_bounds(messages_df['thread_id'].to_numpy(), len(threads_df))
+    all_sender_ids = messages_df['sender_id'].to_numpy()
+    all_timestamps = messages_df['timestamp_ms'].to_numpy()
+    all_types = messages_df['type'].to_numpy()
+
+    threads = {}
+    for thread_id, row in enumerate(threads_df.itertuples(index=False)):
+        rows = slice(bounds[thread_id], bounds[thread_id + 1])
+        sender_ids = all_sender_ids[rows]
+        valid = sender_ids != MISSING
+        unique_ids, local_codes = np.unique(sender_ids[valid], return_inverse=True)
+        sender_codes = np.full(len(sender_ids), MISSING, dtype=np.int32)
+        sender_codes[valid] = local_codes
+        threads[row.folder] = (row.signature, ThreadResult(
+            row.folder, row.participants, list(sender_names[unique_ids]), sender_codes,
+            all_timestamps[rows], all_types[rows],
+        ))
+    _touch(path)
+    return threads
+
+
+def store_user_threads(username, signatures, messages_df, threads_df, senders_df):
+    """
+    Save this export's message table and side tables (names as exported) for
+    `username` so the next export only parses changed threads.
+    """
+    if not username or not _ensure_dir(CACHE_DIR):
+        return
+    path = _user_store_path(username)
+    staging = tempfile.mkdtemp(dir=CACHE_DIR, prefix=f".user-{username[:12]}-")
+    try:
+        threads_df.assign(signature=[signatures[folder] for folder in threads_df['folder']]).to_parquet(
+            os.path.join(staging, 'threads.parquet'), compression='zstd'
+        )
+        messages_df.to_parquet(os.path.join(staging, 'messages.parquet'), compression='zstd')
+        senders_df.to_parquet(os.path.join(staging, 'senders.parquet'), compression='zstd')
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(staging, path)
+    except Exception as e:
+        logger.warning(f"Could not save thread store for {username}: {e}")
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def load_export(zip_files, workers=None, use_cache=True, username=None, date_range=None,
+                progress=None, cancel=None, bytes_read=None):
+    """
+    Parse an Instagram export (one or more ZIPs or extracted folders, see
+    open_archive) into the tables the dashboard needs, keeping only messages in
+    `date_range` (see date_range_ms). Results are cached on disk per central
+    directory and, given a `username`, unchanged threads of their previous export
+    are reused. Story likes and connections are left to load_section.
+    Returns a dict with the message tables (see build_tables), what score_inbox
+    derives from them, the skipped deactivated/group counts and UI notices as
+    (level, text). `progress(thread_results, done, total, todo_bytes)`, `cancel`
+    (a threading.Event, raising IngestCancelled) and `bytes_read` serve IngestJob.
+    Raises zipfile.BadZipFile, WorkLimitExceeded or ResourceLimitExceeded.
+    """
+    date_range = normalize_date_range(date_range)
+    notices = []
+    messages_df, threads_df, senders_df = build_tables([])
+    threads_df, senders_df = repair_names(threads_df, senders_df)
+    export = {
+        'file_count': 0,
+        'messages_df': messages_df,
+        'senders_df': senders_df,
+        **score_inbox(messages_df, threads_df, senders_df, []),
+        'deactivated_accounts': 0,
+        'message_files': 0,
+        'notices': notices,
+    }
+
+    deadline = stage_deadline()
+    with open_archive(zip_files, deadline) as z:
+        manifest = build_manifest(z, deadline)
+        export['file_count'] = manifest['file_count']
+        if not manifest['file_count']:
+            return export
+
+        cache_key = manifest_cache_key(manifest, date_range) if use_cache and CACHE_MAX_BYTES > 0 else None
+        if cache_key:
+            cached = load_cached_export(cache_key)
+            if cached is not None:
+                return cached
+
+        notices.extend(check_work(estimate_work(manifest)))
+
+        # Reuse unchanged threads from the user's previous export
+        previous = load_user_threads(username) if cache_key else {}
+        signatures = {}
+        thread_results = []
+        changed = []
+
+        for folder, parts in manifest['threads'].items():
+            signatures[folder] = thread_signature(parts, date_range)
+            stored = previous.get(folder)
+            if stored is not None and stored[0] == signatures[folder]:
+                thread_results.append(stored[1])
+            else:
+                changed.append(len(thread_results))
+                thread_results.append(parts)
+        del previous
+
+        if username and cache_key:
+            logger.info(f"Incremental ingest: {len(changed)} of {len(thread_results)} threads changed")
+
+        # Summarize changed threads (all of their message_N.json parts) in the ingest engine
+        changed_parts = [thread_results[index] for index in changed]
+        done = len(thread_results) - len(changed)
+        todo_bytes = sum(entry.file_size for parts in changed_parts for entry in parts)
+        if progress:
+            progress(thread_results, done, len(thread_results), todo_bytes)
+        deadline = stage_deadline()
+        for index, result, thread_notices in summarize_threads(
+            zip_files, z, changed_parts, workers, date_range, bytes_read, deadline
+        ):
+            if cancel is not None and cancel.is_set():
+                raise IngestCancelled()
+            notices.extend(thread_notices)
+            thread_results[changed[index]] = result
+            done += 1
+            if progress:
+                progress(thread_results, done, len(thread_results), todo_bytes)
+        thread_results = [result for result in thread_results if isinstance(result, ThreadResult)]
+
+        if not thread_results:
+            notices.append(('warning', "⚠️ No message files found in the expected location."))
+
+        # The thread store keeps names as exported; the export gets them repaired
+        messages_df, threads_df, senders_df = build_tables(thread_results)
+        export['messages_df'] = messages_df
+        export['threads_df'], export['senders_df'] = repair_names(threads_df, senders_df)
+        export.update(score_inbox(messages_df, export['threads_df'], export['senders_df'], notices))
+        export['deactivated_accounts'] = len(manifest['deactivated_accounts'])
+        export['message_files'] = len(thread_results)
+
+    if cache_key:
+        store_user_threads(username, signatures, messages_df, threads_df, senders_df)
+        store_cached_export(cache_key, export)
+    return export
+
+
+class IngestJob:
+    """
+    Run load_export in a background thread so a UI can keep rendering. While the
+    inbox is being parsed, snapshot() returns a partial export refreshed every
+    SNAPSHOT_INTERVAL seconds: only inbox_df with the names and msgs_count of the
+    friends found so far, counted as their threads finish, so a snapshot costs
+    time in the number of new threads rather than messages. Reply times and
+    everything else score_inbox derives come with the full export once done.
+    status() reports progress by uncompressed bytes read, with an ETA. `key`
+    identifies what the job was started for, so a caller can cancel() it when
+    the input changes. Remaining keyword arguments go to load_export.
+    """
+
+    def __init__(self, zip_files, key=None, **kwargs):
+        self.key = key
+        self.done = False
+        self.error = None
+        self.progress = (0, 0)
+        self._todo_bytes = 0
+        self._started = None
+        self._bytes_read = multiprocessing.get_context('spawn').Value('q', 0)
+        self._cancel = threading.Event()
+        self._snapshot = None
+        self._published = threading.Event()
+        self._last_snapshot = 0.0
+        self._pending = None
+        self._friends = {}
+        self._thread = threading.Thread(
+            target=self._run, args=(zip_files, kwargs), name='ig-ingest', daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, zip_files, kwargs):
+        try:
+            self._snapshot = load_export(
+                zip_files, progress=self._publish, cancel=self._cancel, bytes_read=self._bytes_read, **kwargs
+            )
+        except IngestCancelled:
+            logger.info("Ingest cancelled")
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._published.set()
+
+    def _publish(self, thread_results, done, total, todo_bytes):
+        self.progress = (done, total)
+        self._todo_bytes = todo_bytes
+        now = time.monotonic()
+        if self._started is None:
+            self._started = now
+        if done < total and self._snapshot is not None and now - self._last_snapshot < SNAPSHOT_INTERVAL:
+            return
+
+        # Count the threads finished since the last snapshot into their friends
+        if self._pending is None:
+            self._pending = range(len(thread_results))
+        finished = [index for index in self._pending if isinstance(thread_results[index], ThreadResult)]
+        self._pending = [index for index in self._pending if not isinstance(thread_results[index], ThreadResult)]
+        results = [thread_results[index] for index in finished]
+        names = repair_mojibake(
+            [result.participants[0] if len(result.participants) else None for result in results], 'participant names'
+        )
+        for result, name in zip(results, names):
+            handle = friend_handle(result.folder, result.participants)
+            if handle is not None:
+                self._friends.setdefault(handle, [name, 0])[1] += len(result.timestamps)
+
+        handles = list(self._friends)
+        names, counts = zip(*self._friends.values()) if handles else ((), ())
+        inbox_df = pd.DataFrame({'names': label_friends(names, handles), 'msgs_count': np.array(counts, dtype=np.int64)})
+        inbox_df = inbox_df.sort_values(by='msgs_count', ascending=False, kind='stable').reset_index(drop=True)
+        self._snapshot = {
+            'inbox_df': inbox_df,
+            'message_files': len(thread_results) - len(self._pending),
+            'partial': True,
+        }
+        self._last_snapshot = now
+        self._published.set()
+
+    def snapshot(self):
+        """The latest (partial or final) export dict, or None before the first threads finish."""
+        return self._snapshot
+
+    def wait_snapshot(self, timeout=None):
+        """Block until the first snapshot is published or the job ends, at most `timeout` seconds; returns snapshot()."""
+        self._published.wait(timeout)
+        return self._snapshot
+
+    def status(self):
+        """
+        (fraction done, ETA in seconds) by uncompressed bytes read; the ETA is
+        None until there is a read rate to extrapolate from.
+        """
+        if self.done:
+            return 1.0, 0.0
+        read = self._bytes_read.value
+        if not self._todo_bytes or self._started is None:
+            return 0.0, None
+        fraction = min(read / self._todo_bytes, 1.0)
+        elapsed = time.monotonic() - self._started
+        if not read or elapsed <= 0:
+            return fraction, None
+        return fraction, max(self._todo_bytes - read, 0) / (read / elapsed)
+
+    def cancel(self):
+        """Ask the ingest to stop at the next finished thread; it does not wait for it."""
+        self._cancel.set()
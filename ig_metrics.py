@@ -0,0 +1,540 @@
+import numpy as np
+import pandas as pd
+
+# The message table (see ig_ingest.build_tables) has one row per message, grouped by
+# thread and oldest first within a thread:
+#   thread_id    int32  row of the threads table
+#   sender_id    int32  row of the senders table, MISSING when the message has no sender
+#   timestamp_ms int64  MISSING when the message has no (valid) timestamp
+#   type         int8   one of the TYPE_* codes below
+
+# Stand-in for a missing sender or timestamp in the message table
+MISSING = -1
+
+# Message kinds stored in the `type` column
+TYPE_TEXT, TYPE_MEDIA, TYPE_SHARE, TYPE_CALL, TYPE_OTHER = range(5)
+
+# Segments up to this many values are summed side by side in sequential_segment_sums
+SHORT_SEGMENT = 64
+
+# Reply-time sketches: log-spaced buckets from SKETCH_MIN_SECONDS (1 ms, the export's
+# resolution) to SKETCH_MAX_SECONDS (about 3 years), each within SKETCH_ACCURACY relative error
+SKETCH_MIN_SECONDS = 0.001
+SKETCH_MAX_SECONDS = 1e8
+SKETCH_ACCURACY = 0.02
+SKETCH_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+SKETCH_BUCKETS = int(np.ceil(np.log(SKETCH_MAX_SECONDS / SKETCH_MIN_SECONDS) / np.log(SKETCH_GAMMA))) + 1
+
+# Reply-time quantiles added to the inbox table, and the reply-time histogram ranges (seconds)
+REPLY_QUANTILES = (0.5, 0.9, 0.99)
+REPLY_TIME_EDGES = (60, 300, 1800, 3600, 6 * 3600, 24 * 3600, 7 * 24 * 3600)
+REPLY_TIME_LABELS = ('< 1 min', '1-5 min', '5-30 min', '30-60 min', '1-6 h', '6-24 h', '1-7 days', '> 7 days')
+
+# Directions of a message in the rollup cube: from the friend, or from you to them
+DIRECTIONS = ('received', 'sent')
+
+# Hour-of-week activity heatmaps: one column per hour, labelled "Mon 00" to "Sun 23"
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+HOURS_PER_WEEK = 7 * 24
+HOUR_OF_WEEK_LABELS = tuple(f"{day} {hour:02d}" for day in WEEKDAYS for hour in range(24))
+
+
+def thread_bounds(thread_ids, thread_count):
+    """Offsets where each thread's rows start in the message table, plus the end: thread t is bounds[t]:bounds[t + 1]."""
+    return np.concatenate(([0], np.cumsum(np.bincount(thread_ids, minlength=thread_count))))
+
+
+def sort_within_threads(thread_ids, timestamps):
+    """
+    Row order that puts every thread's messages oldest first (missing timestamps
+    sort as 0, ties keep their order), or None when the rows already are. Threads
+    must be contiguous, as in the message table.
+    """
+    keys = np.where(timestamps == MISSING, 0, timestamps)
+    same_thread = thread_ids[1:] == thread_ids[:-1]
+    if not np.any(same_thread & (keys[1:] < keys[:-1])):
+        return None
+    return np.lexsort((keys, thread_ids))
+
+
+def reply_gaps(thread_ids, sender_ids, timestamps):
+    """
+    Every reply in the message table in one pass: a message that follows, within
+    the same thread, a message from a different sender with both senders and
+    timestamps present and a strictly later timestamp. Rows must be oldest first
+    within each thread (see sort_within_threads).
+    Returns (rows, seconds): the row of each replying message and its reply time.
+    """
+    previous = slice(None, -1)
+    current = slice(1, None)
+    valid = (sender_ids != MISSING) & (timestamps != MISSING)
+    diffs = timestamps[current] - timestamps[previous]
+    is_reply = (
+        (thread_ids[current] == thread_ids[previous])
+        & valid[current] & valid[previous]
+        & (sender_ids[current] != sender_ids[previous])
+        & (diffs > 0)
+    )
+    rows = np.flatnonzero(is_reply) + 1
+    return rows, diffs[is_reply] / 1000
+
+
+def sequential_segment_sums(values, starts, counts, short_segment=SHORT_SEGMENT):
+    """
+    Sum each segment values[start:start + count] left to right, rounding exactly
+    like Python's sum() (np.add.reduceat sums pairwise and can differ in the last
+    bits). Segments up to `short_segment` long are summed together one element
+    per step; longer ones take one cumulative sum each.
+    """
+    sums = np.zeros(len(starts))
+    short = np.flatnonzero((counts > 0) & (counts <= short_segment))
+    for step in range(int(counts[short].max()) if len(short) else 0):
+        short = short[counts[short] > step]
+        sums[short] += values[starts[short] + step]
+    for segment in np.flatnonzero(counts > short_segment):
+        sums[segment] = np.cumsum(values[starts[segment]:starts[segment] + counts[segment]])[-1]
+    return sums
+
+
+def thread_replies(thread_ids, sender_ids, timestamps, scored=None):
+    """
+    Every reply of the message table (see reply_gaps), re-sorting the rows first
+    if needed, restricted to the threads where the boolean mask `scored` is True.
+    Returns (reply_threads, seconds): thread of each reply and its reply time,
+    grouped by thread and in message order within a thread.
+    """
+    order = sort_within_threads(thread_ids, timestamps)
+    if order is not None:
+        thread_ids, sender_ids, timestamps = thread_ids[order], sender_ids[order], timestamps[order]
+
+    rows, seconds = reply_gaps(thread_ids, sender_ids, timestamps)
+    reply_threads = thread_ids[rows]
+    if scored is not None:
+        keep = scored[reply_threads]
+        reply_threads, seconds = reply_threads[keep], seconds[keep]
+    return reply_threads, seconds
+
+
+def reduce_reply_times(reply_threads, seconds, thread_count):
+    """Per-thread (avg, fastest, longest) arrays from the grouped replies of thread_replies, 0 without replies."""
+    counts = np.bincount(reply_threads, minlength=thread_count)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])) if thread_count else np.empty(0, np.int64)
+    avg_reply = np.zeros(thread_count)
+    fastest_reply = np.zeros(thread_count)
+    longest_reply = np.zeros(thread_count)
+
+    replied = np.flatnonzero(counts)
+    if len(replied):
+        avg_reply[replied] = sequential_segment_sums(seconds, starts[replied], counts[replied]) / counts[replied]
+        fastest_reply[replied] = np.minimum.reduceat(seconds, starts[replied])
+        longest_reply[replied] = np.maximum.reduceat(seconds, starts[replied])
+    return avg_reply, fastest_reply, longest_reply
+
+
+def sketch_buckets(seconds):
+    """Sketch bucket of each reply time: ceil(log_gamma(seconds / SKETCH_MIN_SECONDS)), clamped to the sketch range."""
+    with np.errstate(divide='ignore'):
+        buckets = np.ceil(np.log(np.asarray(seconds, dtype=np.float64) / SKETCH_MIN_SECONDS) / np.log(SKETCH_GAMMA))
+    return np.clip(np.nan_to_num(buckets, neginf=0), 0, SKETCH_BUCKETS - 1).astype(np.int16)
+
+
+def bucket_values(buckets):
+    """
+    Representative reply time of each sketch bucket, within SKETCH_ACCURACY
+    (relative) of every value the bucket holds.
+    """
+    return SKETCH_MIN_SECONDS * SKETCH_GAMMA ** np.asarray(buckets, dtype=np.float64) * 2 / (SKETCH_GAMMA + 1)
+
+
+def build_sketches(keys, seconds):
+    """
+    Quantile sketches of reply times, one per key: log-spaced buckets with
+    relative accuracy SKETCH_ACCURACY (as in DDSketch), so a sketch holds at most
+    SKETCH_BUCKETS counts however many replies it summarizes.
+    Returns a sparse sketch table with key, bucket and count columns, sorted by
+    key and bucket; sketches merge by adding counts (see merge_sketches).
+    """
+    sketch_df = pd.DataFrame({'key': keys, 'bucket': sketch_buckets(seconds)})
+    return merge_sketches(sketch_df.assign(count=np.ones(len(sketch_df), dtype=np.int64)))
+
+
+def merge_sketches(*sketch_dfs):
+    """
+    Merge sketch tables by adding the counts of equal (key, bucket) pairs. Keys
+    may be anything hashable, e.g. thread ids within one export, or friend names
+    to combine the sketches of several exports.
+    """
+    merged = pd.concat(sketch_dfs, ignore_index=True) if len(sketch_dfs) > 1 else sketch_dfs[0]
+    return merged.groupby(['key', 'bucket'], as_index=False, sort=True)['count'].sum()
+
+
+def sketch_quantiles(sketch_df, quantiles=REPLY_QUANTILES):
+    """
+    Estimated quantiles of every sketch: the value of the bucket holding rank
+    q * (count - 1), within SKETCH_ACCURACY of the exact quantile.
+    Returns a DataFrame indexed by key with one p<q>_reply_time column per quantile.
+    """
+    sketch_df = sketch_df.sort_values(['key', 'bucket'], kind='stable')
+    by_key = sketch_df.groupby('key', sort=False)['count']
+    below = by_key.cumsum().to_numpy()
+    ranks = by_key.transform('sum').to_numpy() - 1
+    keys = sketch_df['key'].to_numpy()
+    values = bucket_values(sketch_df['bucket'].to_numpy())
+
+    result = pd.DataFrame(index=pd.Index(pd.unique(keys), name='key'))
+    for q in quantiles:
+        hit = below > q * ranks
+        first = pd.Series(values[hit], index=keys[hit])
+        result[quantile_column(q)] = first[~first.index.duplicated()]
+    return result
+
+
+def quantile_column(q):
+    """Column name of a reply-time quantile, e.g. 0.9 -> 'p90_reply_time'."""
+    return f"p{q * 100:g}_reply_time".replace('.', '_')
+
+
+def sketch_histogram(sketch_df, edges=REPLY_TIME_EDGES, labels=REPLY_TIME_LABELS):
+    """
+    Reply counts of every sketch in the reply-time ranges between `edges`
+    (seconds), a bucket counting towards the range its representative value is in.
+    Returns a DataFrame indexed by key with one column per label.
+    """
+    bins = np.searchsorted(edges, bucket_values(sketch_df['bucket'].to_numpy()), side='right')
+    histogram = (
+        pd.DataFrame({'key': sketch_df['key'].to_numpy(), 'bin': bins, 'count': sketch_df['count'].to_numpy()})
+        .pivot_table(index='key', columns='bin', values='count', aggfunc='sum', fill_value=0)
+        .reindex(columns=range(len(labels)), fill_value=0)
+    )
+    histogram.columns = list(labels)
+    return histogram
+
+
+def friend_metrics(messages_df, friend_of_thread, friend_count):
+    """
+    Message count and reply-time stats of every friend, from the message table,
+    and the reply-time sketches of the friends (see build_sketches).
+    `friend_of_thread` gives the friend (0 to friend_count - 1) of each thread,
+    MISSING for threads that are not a friend's, such as group chats. Replies
+    are found within each thread and then pooled per friend, so a friend with
+    several threads has the replies of all of them and none between them.
+    Returns (metrics, sketch_df): a DataFrame with one row per friend (msgs_count,
+    avg_reply_time, fastest_reply_time, longest_reply_time), and a sketch table
+    keyed by friend.
+    """
+    friend_of_thread = np.asarray(friend_of_thread, dtype=np.int64)
+    thread_ids = messages_df['thread_id'].to_numpy()
+    reply_threads, seconds = thread_replies(
+        thread_ids, messages_df['sender_id'].to_numpy(), messages_df['timestamp_ms'].to_numpy(),
+        friend_of_thread != MISSING,
+    )
+
+    # Group the replies by friend, keeping thread and message order within a friend
+    reply_friends = friend_of_thread[reply_threads]
+    order = np.argsort(reply_friends, kind='stable')
+    reply_friends, seconds = reply_friends[order], seconds[order]
+    avg_reply, fastest_reply, longest_reply = reduce_reply_times(reply_friends, seconds, friend_count)
+
+    friends = friend_of_thread[thread_ids]
+    metrics = pd.DataFrame({
+        'msgs_count': np.bincount(friends[friends != MISSING], minlength=friend_count),
+        'avg_reply_time': avg_reply,
+        'fastest_reply_time': fastest_reply,
+        'longest_reply_time': longest_reply,
+    })
+    return metrics, build_sketches(reply_friends, seconds)
+
+
+def sessionize(thread_ids, timestamps, gap_seconds):
+    """
+    Split every thread into sessions at silences longer than `gap_seconds`; rows
+    must be oldest first within each thread. Sessions are numbered from 0 in
+    table order. Returns the session of every row, MISSING for rows without a
+    timestamp, which cannot be placed.
+    """
+    timed = np.flatnonzero(timestamps != MISSING)
+    session_threads, session_times = thread_ids[timed], timestamps[timed]
+    starts = np.ones(len(timed), dtype=bool)
+    starts[1:] = (session_threads[1:] != session_threads[:-1]) | (session_times[1:] - session_times[:-1] > gap_seconds * 1000)
+    sessions = np.full(len(timestamps), MISSING, dtype=np.int64)
+    sessions[timed] = np.cumsum(starts) - 1
+    return sessions
+
+
+def build_sessions_df(messages_df, gap_seconds):
+    """
+    Conversation sessions of every thread in one pass over the message table
+    (see sessionize), one row each: thread_id, start_ms, end_ms, duration
+    (seconds), msgs_count, initiator_id (sender_id of the first message, MISSING
+    if unknown), reply_count and avg_reply_time of the replies within the session,
+    so a reply after a long silence does not count.
+    """
+    thread_ids = messages_df['thread_id'].to_numpy()
+    sender_ids = messages_df['sender_id'].to_numpy()
+    timestamps = messages_df['timestamp_ms'].to_numpy()
+    order = sort_within_threads(thread_ids, timestamps)
+    if order is not None:
+        thread_ids, sender_ids, timestamps = thread_ids[order], sender_ids[order], timestamps[order]
+
+    sessions = sessionize(thread_ids, timestamps, gap_seconds)
+    timed = np.flatnonzero(sessions != MISSING)
+    session_of = sessions[timed]
+    first = timed[np.flatnonzero(np.diff(session_of, prepend=MISSING))]
+    last = timed[np.append(np.flatnonzero(np.diff(session_of)), len(timed) - 1)] if len(timed) else first
+
+    # A reply belongs to a session when the message it answers does
+    rows, seconds = reply_gaps(thread_ids, sender_ids, timestamps)
+    in_session = sessions[rows] == sessions[rows - 1]
+    reply_sessions = sessions[rows[in_session]]
+    reply_count = np.bincount(reply_sessions, minlength=len(first))
+    reply_sum = np.bincount(reply_sessions, weights=seconds[in_session], minlength=len(first))
+
+    return pd.DataFrame({
+        'thread_id': thread_ids[first],
+        'start_ms': timestamps[first],
+        'end_ms': timestamps[last],
+        'duration': (timestamps[last] - timestamps[first]) / 1000,
+        'msgs_count': np.bincount(session_of, minlength=len(first)),
+        'initiator_id': sender_ids[first],
+        'reply_count': reply_count,
+        'avg_reply_time': np.divide(reply_sum, reply_count, out=np.zeros(len(first)), where=reply_count > 0),
+    })
+
+
+def local_time_ms(timestamps, tz='UTC'):
+    """
+    Wall-clock time in the IANA time zone `tz` (daylight saving included) of
+    epoch-millisecond timestamps, as milliseconds since 1970-01-01 00:00 local.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if tz == 'UTC':
+        return timestamps
+    local = pd.to_datetime(timestamps, unit='ms', utc=True).tz_convert(tz).tz_localize(None)
+    return local.to_numpy().astype('datetime64[ms]').astype(np.int64)
+
+
+def month_index(local_ms):
+    """Calendar month of local_time_ms values, as months since January 1970."""
+    return np.asarray(local_ms, dtype='datetime64[ms]').astype('datetime64[M]').astype(np.int64)
+
+
+def hour_of_week(local_ms):
+    """Hour of the week of local_time_ms values: 0 is Monday 00:00-00:59, 167 is Sunday 23:00-23:59."""
+    # 1970-01-01 was a Thursday, 72 hours after the start of its week
+    return (np.asarray(local_ms, dtype=np.int64) // 3_600_000 + 72) % HOURS_PER_WEEK
+
+
+def build_rollup_cube(messages_df, friend_of_thread, received, friend_names, tz='UTC'):
+    """
+    Friend x calendar month (in time zone `tz`) x direction rollup of the message table, built
+    in one pass so trend views only slice it. `friend_of_thread` gives the friend
+    (index into friend_names) of each thread, MISSING for threads that are not a
+    friend's; `received` marks the rows of the message table sent by the
+    thread's friend, the others are 'sent'. Messages without a sender or
+    timestamp are left out. Replies (see reply_gaps) count in the cell of the
+    replying message.
+    Returns one row per non-empty cell: friend, month (first day, datetime64),
+    direction, msgs_count, reply_count, reply_time_sum (seconds) and the
+    p50/p90 reply times of the cell's sketch.
+    """
+    thread_ids = messages_df['thread_id'].to_numpy()
+    sender_ids = messages_df['sender_id'].to_numpy()
+    timestamps = messages_df['timestamp_ms'].to_numpy()
+    order = sort_within_threads(thread_ids, timestamps)
+    received = np.asarray(received, dtype=bool)
+    if order is not None:
+        thread_ids, sender_ids, timestamps, received = thread_ids[order], sender_ids[order], timestamps[order], received[order]
+    friend_of_thread = np.asarray(friend_of_thread, dtype=np.int64)
+
+    # Cell of every message, MISSING for messages outside the cube
+    friends = friend_of_thread[thread_ids] if len(friend_of_thread) else np.full(len(thread_ids), MISSING)
+    inside = (friends != MISSING) & (sender_ids != MISSING) & (timestamps != MISSING)
+    months = month_index(local_time_ms(np.where(inside, timestamps, 0), tz))
+    first_month = months[inside].min() if inside.any() else 0
+    month_count = months[inside].max() - first_month + 1 if inside.any() else 1
+    sent = ~received
+    cells = np.where(inside, (friends * month_count + months - first_month) * len(DIRECTIONS) + sent, MISSING)
+
+    used, message_cells = np.unique(cells[inside], return_inverse=True)
+    rows, seconds = reply_gaps(thread_ids, sender_ids, timestamps)
+    replied = inside[rows]
+    reply_cells = np.searchsorted(used, cells[rows[replied]])
+    seconds = seconds[replied]
+
+    friend, rest = np.divmod(used, month_count * len(DIRECTIONS))
+    month, direction = np.divmod(rest, len(DIRECTIONS))
+    quantiles = sketch_quantiles(build_sketches(reply_cells, seconds), (0.5, 0.9)).reindex(range(len(used)))
+    return pd.DataFrame({
+        'friend': np.asarray(friend_names, dtype=object)[friend],
+        'month': (month + first_month).astype('datetime64[M]').astype('datetime64[ns]'),
+        'direction': np.asarray(DIRECTIONS, dtype=object)[direction],
+        'msgs_count': np.bincount(message_cells, minlength=len(used)),
+        'reply_count': np.bincount(reply_cells, minlength=len(used)),
+        'reply_time_sum': np.bincount(reply_cells, weights=seconds, minlength=len(used)),
+        'p50_reply_time': quantiles['p50_reply_time'].to_numpy(),
+        'p90_reply_time': quantiles['p90_reply_time'].to_numpy(),
+    })
+
+
+def activity_heatmaps(messages_df, friend_of_thread, friend_count, tz='UTC'):
+    """
+    Hour-of-week message counts (in time zone `tz`) in one pass over the message
+    table: bincount into a (friend_count, HOURS_PER_WEEK) matrix for the friends
+    of `friend_of_thread` (see build_rollup_cube) and into one row for every
+    message of the export. Messages without a timestamp are left out.
+    Returns (friend_matrix, all_counts) as int64 arrays.
+    """
+    timestamps = messages_df['timestamp_ms'].to_numpy()
+    timed = timestamps != MISSING
+    hours = hour_of_week(local_time_ms(timestamps[timed], tz))
+    all_counts = np.bincount(hours, minlength=HOURS_PER_WEEK)
+
+    friend_of_thread = np.asarray(friend_of_thread, dtype=np.int64)
+    friends = friend_of_thread[messages_df['thread_id'].to_numpy()[timed]] if len(friend_of_thread) else hours[:0]
+    mine = friends != MISSING
+    friend_matrix = np.bincount(
+        friends[mine] * HOURS_PER_WEEK + hours[mine], minlength=friend_count * HOURS_PER_WEEK
+    ).reshape(friend_count, HOURS_PER_WEEK)
+    return friend_matrix, all_counts
+
+
+def heatmap_cells(counts):
+    """One heatmap row (HOURS_PER_WEEK counts) as a long table of day, hour and messages, for charting."""
+    return pd.DataFrame({
+        'day': np.repeat(WEEKDAYS, 24),
+        'hour': np.tile(np.arange(24), 7),
+        'messages': np.asarray(counts, dtype=np.int64),
+    })
+
+
+def build_rank_index(inbox_df):
+    """
+    Sorted index of the inbox for Top-K queries (see top_k). The inbox must be
+    sorted by msgs_count, most messages first, as ig_ingest.build_inbox_df
+    leaves it, so the friends above a message threshold are a prefix of it.
+    For every reply-time column the index holds the inbox rows in ascending
+    (`<column>`) and descending (`<column>_desc`) order of that column, ties in
+    inbox order like nsmallest/nlargest, rows without a value last.
+    """
+    orders = {}
+    for column in inbox_df.columns:
+        if column.endswith('_reply_time'):
+            values = inbox_df[column].to_numpy(dtype=np.float64)
+            orders[column] = np.argsort(values, kind='stable')
+            orders[f"{column}_desc"] = np.argsort(-values, kind='stable')
+    return pd.DataFrame(orders, index=pd.RangeIndex(len(inbox_df)))
+
+
+def friend_count_above(inbox_df, threshold):
+    """
+    How many friends of the inbox (sorted by msgs_count, most messages first) have
+    more than `threshold` messages; they are its first rows. A binary search.
+    """
+    return int(np.searchsorted(-inbox_df['msgs_count'].to_numpy(), -threshold, side='left'))
+
+
+def top_k(inbox_df, rank_df, column, k, threshold=0, largest=False):
+    """
+    The k friends with the smallest (or `largest`) `column` among those with more
+    than `threshold` messages, in rank order: the same rows as
+    inbox_df[inbox_df['msgs_count'] > threshold].nsmallest(k, column).
+    A binary search on the message counts finds the friends above the threshold
+    (a prefix of the inbox); the column's order in rank_df (see build_rank_index)
+    is then read from the start only until k of them are found. Without a
+    threshold that is a slice; otherwise it reads about k * n / eligible entries,
+    all n in the worst case.
+    """
+    eligible = friend_count_above(inbox_df, threshold)
+    order = rank_df[f"{column}_desc" if largest else column].to_numpy()
+    if eligible == len(order):
+        return inbox_df.iloc[order[:k]]
+
+    rows = order[:0]
+    start, step = 0, max(k, 1) * 4
+    while len(rows) < k and start < len(order):
+        block = order[start:start + step]
+        rows = np.concatenate((rows, block[block < eligible]))
+        start, step = start + step, step * 2
+    return inbox_df.iloc[rows[:k]]
+
+
+def group_reply_matrix(messages_df, grouped):
+    """
+    Sparse "who replies to whom" matrix of the group chats, in one pass over the
+    message table: every reply (see reply_gaps) in a thread where the boolean mask
+    `grouped` is True counts for the pair (replier, the sender of the message
+    replied to) within that thread. Only non-empty cells are stored, as a COO
+    table with one row per (thread_id, replier_id, replied_to_id), sorted:
+    reply_count and reply_time_sum (seconds). Sum over thread_id for the matrix
+    of all groups; see member_responsiveness and pair_affinity.
+    """
+    thread_ids = messages_df['thread_id'].to_numpy()
+    sender_ids = messages_df['sender_id'].to_numpy()
+    timestamps = messages_df['timestamp_ms'].to_numpy()
+    order = sort_within_threads(thread_ids, timestamps)
+    if order is not None:
+        thread_ids, sender_ids, timestamps = thread_ids[order], sender_ids[order], timestamps[order]
+
+    rows, seconds = reply_gaps(thread_ids, sender_ids, timestamps)
+    keep = np.asarray(grouped, dtype=bool)[thread_ids[rows]]
+    rows, seconds = rows[keep], seconds[keep]
+
+    # One int64 key per cell; unique cells in key order are the matrix in thread, replier, replied-to order
+    senders = np.int64(max(int(sender_ids.max()) + 1, 1) if len(sender_ids) else 1)
+    keys = (thread_ids[rows].astype(np.int64) * senders + sender_ids[rows]) * senders + sender_ids[rows - 1]
+    cells, cell_of_reply = np.unique(keys, return_inverse=True)
+    return pd.DataFrame({
+        'thread_id': (cells // senders // senders).astype(np.int32),
+        'replier_id': (cells // senders % senders).astype(np.int32),
+        'replied_to_id': (cells % senders).astype(np.int32),
+        'reply_count': np.bincount(cell_of_reply, minlength=len(cells)),
+        'reply_time_sum': np.bincount(cell_of_reply, weights=seconds, minlength=len(cells)),
+    })
+
+
+def member_responsiveness(reply_matrix_df):
+    """
+    Per-member responsiveness from (a slice of) group_reply_matrix, indexed by
+    sender id: replies_sent and avg_reply_time of the member's replies,
+    replies_received (replies to the member's messages) and partners, the number
+    of other members they replied to.
+    """
+    pairs = reply_matrix_df.groupby(['replier_id', 'replied_to_id'], sort=False)['reply_count'].sum()
+    sent = reply_matrix_df.groupby('replier_id')[['reply_count', 'reply_time_sum']].sum()
+    received = reply_matrix_df.groupby('replied_to_id')['reply_count'].sum()
+    members = sent.index.union(received.index).rename('sender_id')
+    sent = sent.reindex(members, fill_value=0)
+    return pd.DataFrame({
+        'replies_sent': sent['reply_count'],
+        'avg_reply_time': (sent['reply_time_sum'] / sent['reply_count'].where(sent['reply_count'] > 0)).fillna(0.0),
+        'replies_received': received.reindex(members, fill_value=0),
+        'partners': pairs.index.get_level_values('replier_id').value_counts().reindex(members, fill_value=0),
+    }, index=members)
+
+
+def pair_affinity(reply_matrix_df):
+    """
+    Pairwise affinity from (a slice of) group_reply_matrix: one row per pair of
+    members with replies between them (member_a_id < member_b_id), with
+    reply_count in both directions, their avg_reply_time and affinity, the share
+    of the two members' replies that went to each other (0 to 1).
+    Sorted by affinity, strongest first.
+    """
+    replier = reply_matrix_df['replier_id'].to_numpy()
+    replied_to = reply_matrix_df['replied_to_id'].to_numpy()
+    pairs = pd.DataFrame({
+        'member_a_id': np.minimum(replier, replied_to),
+        'member_b_id': np.maximum(replier, replied_to),
+        'reply_count': reply_matrix_df['reply_count'].to_numpy(),
+        'reply_time_sum': reply_matrix_df['reply_time_sum'].to_numpy(),
+    }).groupby(['member_a_id', 'member_b_id'], as_index=False).sum()
+
+    sent = reply_matrix_df.groupby('replier_id')['reply_count'].sum()
+    both_sent = sent.reindex(pairs['member_a_id'], fill_value=0).to_numpy() + sent.reindex(pairs['member_b_id'], fill_value=0).to_numpy()
+    pairs['avg_reply_time'] = pairs['reply_time_sum'] / pairs['reply_count']
+    pairs['affinity'] = pairs['reply_count'] / both_sent
+    return (
+        pairs.drop(columns='reply_time_sum')
+        .sort_values('affinity', ascending=False, kind='stable')
+        .reset_index(drop=True)
+    )
@@ -0,0 +1,126 @@
+"""
+friend_metrics against a scalar reference on randomized threads.
+
+The reference is the original per-conversation loop: sort a thread's messages
+by timestamp (missing ones as 0, ties in order), count a reply whenever a message
+follows one from a different sender with both senders and timestamps present
+and a strictly later timestamp, and pool each friend's replies over their
+threads in thread order. The vectorized metrics must match it exactly.
+"""
+import math
+import random
+
+import pytest
+
+import ig_ingest
+from ig_metrics import friend_metrics
+
+ME = 'Me'
+
+
+def valid_timestamp(value):
+    return type(value) is int and 0 <= value < 1 << 63
+
+
+def reference_replies(messages):
+    """Reply times (seconds) of one thread, in message order, like the original calculate_reply_times."""
+    ordered = sorted(messages, key=lambda msg: msg['timestamp_ms'] if valid_timestamp(msg.get('timestamp_ms')) else 0)
+    replies = []
+    for previous, current in zip(ordered, ordered[1:]):
+        if not all(msg.get('sender_name') is not None and valid_timestamp(msg.get('timestamp_ms'))
+                   for msg in (previous, current)):
+            continue
+        if previous['sender_name'] != current['sender_name']:
+            diff = current['timestamp_ms'] - previous['timestamp_ms']
+            if diff > 0:
+                replies.append(diff / 1000)
+    return replies
+
+
+def reference_metrics(threads):
+    """{friend: (msgs_count, avg, fastest, longest)} from raw (folder, friend, messages) threads."""
+    counts, replies = {}, {}
+    for _, friend, messages in threads:
+        counts[friend] = counts.get(friend, 0) + len(messages)
+        replies.setdefault(friend, []).extend(reference_replies(messages))
+    return {
+        friend: (counts[friend], sum(times) / len(times), min(times), max(times)) if times else (counts[friend], 0, 0, 0)
+        for friend, times in replies.items()
+    }
+
+
+def random_timestamp(rng, clock):
+    roll = rng.random()
+    if roll < 0.05:
+        return None
+    if roll < 0.08:
+        return float('nan')
+    if roll < 0.10:
+        return -5
+    if roll < 0.15:
+        return clock  # a tie with the previous message
+    return clock + rng.randint(1, 3_600_000)
+
+
+def random_threads(rng, thread_count):
+    """Friends with one or more threads; same-sender runs, ties, missing senders and bad timestamps included."""
+    threads = []
+    for index in range(thread_count):
+        friend = f"friend{rng.randrange(max(1, thread_count // 2))}"
+        messages, clock, sender = [], 1_600_000_000_000, ME
+        for _ in range(rng.randint(0, 60)):
+            if rng.random() < 0.4:
+                sender = friend if sender == ME else ME  # otherwise the run continues
+            timestamp = random_timestamp(rng, clock)
+            if valid_timestamp(timestamp):
+                clock = timestamp
+            message = {'sender_name': None if rng.random() < 0.03 else sender}
+            if timestamp is not None:
+                message['timestamp_ms'] = timestamp
+            messages.append(message)
+        if rng.random() < 0.5:
+            rng.shuffle(messages)  # parts out of order
+        threads.append((f"{friend}_{index}", friend, messages))
+    return threads
+
+
+def table_metrics(threads):
+    """The same threads through the ingest's encoding, message table and friend_metrics."""
+    results = [
+        ig_ingest.ThreadResult(
+            folder, [friend, ME], *ig_ingest.encode_messages(ig_ingest.project_messages(messages))
+        )
+        for folder, friend, messages in threads
+    ]
+    messages_df, threads_df, _ = ig_ingest.build_tables(results)
+    threads_df = threads_df.assign(name=[friend for _, friend, _ in threads])
+    friend_of_thread, friend_names, _ = ig_ingest.select_friends(threads_df)
+    metrics, _ = friend_metrics(messages_df, friend_of_thread, len(friend_names))
+    return dict(zip(friend_names, metrics.itertuples(index=False, name=None)))
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_friend_metrics_match_scalar_reference(seed):
+    rng = random.Random(seed)
+    threads = random_threads(rng, rng.randint(1, 12))
+
+    expected = reference_metrics(threads)
+    actual = table_metrics(threads)
+
+    assert actual.keys() == expected.keys()
+    for friend, values in expected.items():
+        assert actual[friend] == values, friend
+        assert not any(isinstance(value, float) and math.isnan(value) for value in actual[friend])
+
+
+def test_same_sender_runs_and_ties_are_not_replies():
+    messages = [
+        {'sender_name': ME, 'timestamp_ms': 1_000},
+        {'sender_name': ME, 'timestamp_ms': 2_000},
+        {'sender_name': 'friend', 'timestamp_ms': 2_000},
+        {'sender_name': 'friend', 'timestamp_ms': 5_000},
+        {'sender_name': ME, 'timestamp_ms': 9_000},
+    ]
+    threads = [('friend_1', 'friend', messages)]
+    assert reference_metrics(threads) == {'friend': (5, 4.0, 4.0, 4.0)}
+    assert table_metrics(threads) == {'friend': (5, 4.0, 4.0, 4.0)}